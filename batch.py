@@ -0,0 +1,126 @@
+"""ヘッドレスのバッチ分析
+
+動画URL・チャンネルURLを1行ずつ書いたファイルを読み込み、UIと同じ流れ
+（動画情報 → 字幕 → Gemini分析 → 共通パターン抽出）を実行する。
+1動画の分析が終わるたびにJSONLを1行出力する。APIキーは環境変数 GEMINI_API_KEY から読む。
+
+    python batch.py urls.txt -o results.jsonl --concurrency 8 --patterns
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+from typing import List, TextIO
+
+from checkpoint import run_resumable_pipeline
+from gemini_client import create_model
+from models import VideoResult
+from core import (
+    FETCH_WORKERS, GEMINI_WORKERS, MAX_CHANNEL_VIDEOS,
+    extract_common_patterns, extract_video_id, get_videos_from_channel,
+)
+
+MODEL_NAME = os.environ.get('TUBEHACKER_MODEL', 'gemini-2.0-flash')
+
+
+def read_urls(stream: TextIO) -> List[str]:
+    """空行と # で始まる行を除いたURL"""
+    urls = []
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+def resolve_videos(urls: List[str], channel_videos: int = MAX_CHANNEL_VIDEOS) -> List[dict]:
+    """動画URLはそのまま、チャンネルURLは動画一覧に展開する（重複は除く）"""
+    videos = []
+    seen = set()
+    for url in urls:
+        video_id = extract_video_id(url)
+        found = [{'video_id': video_id, 'url': url}] if video_id else get_videos_from_channel(url, channel_videos, paginate=True)
+        if not found:
+            print(f"動画が見つかりません: {url}", file=sys.stderr)
+        for video in found:
+            if video['video_id'] not in seen:
+                seen.add(video['video_id'])
+                videos.append(video)
+    return videos
+
+
+def to_record(index: int, video: dict, result: VideoResult, include_transcript: bool = False) -> dict:
+    """分析結果をJSONに書ける形にする（サムネイルのバイト列は含めない）"""
+    return {'index': index, **result.to_record(include_transcript), 'url': video.get('url')}
+
+
+def _write(out: TextIO, record: dict):
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    out.flush()
+
+
+def run(args, out: TextIO) -> int:
+    api_key = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
+    if not api_key:
+        print("エラー: 環境変数 GEMINI_API_KEY を設定してください", file=sys.stderr)
+        return 2
+    model = create_model(api_key, MODEL_NAME)
+
+    if args.input == '-':
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            urls = read_urls(f)
+    videos = resolve_videos(urls, args.channel_videos)
+    print(f"{len(videos)}件の動画を分析します", file=sys.stderr)
+
+    results = [None] * len(videos)
+    pipeline = run_resumable_pipeline(
+        model,
+        videos,
+        resume=not args.no_resume,
+        fetch_workers=args.concurrency,
+        gemini_workers=args.gemini_workers,
+        use_cache=not args.no_cache,
+        ordered=False,
+    )
+    for i, result in pipeline:
+        results[i] = result
+        _write(out, {'type': 'video', **to_record(i, videos[i], result, args.include_transcript)})
+
+    succeeded = [r for r in results if r and r.success]
+    if args.patterns and succeeded:
+        patterns, char_stats = extract_common_patterns(model, succeeded, use_cache=not args.no_cache)
+        _write(out, {'type': 'patterns', 'videos': len(succeeded), 'patterns': patterns, 'char_stats': char_stats})
+    return 0 if len(succeeded) == len(videos) else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='YouTube動画を一括分析してJSONLで出力')
+    parser.add_argument('input', help='URLを1行ずつ書いたファイル（- で標準入力）')
+    parser.add_argument('-o', '--output', help='出力先のJSONLファイル（省略時は標準出力）')
+    parser.add_argument('--concurrency', type=int, default=FETCH_WORKERS, help='動画情報・字幕取得の同時実行数')
+    parser.add_argument('--gemini-workers', type=int, default=GEMINI_WORKERS, help='Gemini分析の同時実行数')
+    parser.add_argument('--channel-videos', type=int, default=MAX_CHANNEL_VIDEOS, help='チャンネルURLごとの最大動画数')
+    parser.add_argument('--patterns', action='store_true', help='最後に共通パターンを抽出して出力')
+    parser.add_argument('--include-transcript', action='store_true', help='字幕テキストも出力に含める')
+    parser.add_argument('--no-cache', action='store_true', help='Geminiの応答キャッシュを使わない')
+    parser.add_argument('--no-resume', action='store_true', help='前回の実行で分析済みの動画も分析し直す')
+    args = parser.parse_args(argv)
+
+    # 処理中のメッセージでJSONLが崩れないよう、printは標準エラーへ
+    out = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    try:
+        with redirect_stdout(sys.stderr):
+            return run(args, out)
+    except KeyboardInterrupt:
+        print("中断しました", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""共有Session（keep-alive）と素のrequests.getの1動画あたり取得レイテンシ比較
+
+使い方:
+    python benchmarks/bench_http_pool.py --videos dQw4w9WgXcQ jNQXAC9IVRw --rounds 5
+
+各動画について get_video_info と同じ経路（視聴ページ + サムネイル2種）を取得し、
+1動画あたりの平均/中央値を表示する。ネットワーク接続が必要。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import DEFAULT_HEADERS, create_session  # noqa: E402
+
+
+def fetch_video(get, video_id: str):
+    get(f"https://www.youtube.com/watch?v={video_id}", headers=DEFAULT_HEADERS, timeout=15)
+    get(f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg", timeout=10)
+    get(f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg", timeout=10)
+
+
+def measure(get, video_ids, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        for video_id in video_ids:
+            start = time.perf_counter()
+            fetch_video(get, video_id)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    print(f"{label:<16} mean={statistics.mean(timings):8.1f}ms  "
+          f"median={statistics.median(timings):8.1f}ms  n={len(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=['dQw4w9WgXcQ', 'jNQXAC9IVRw', '9bZkp7q19f0'])
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    bare = measure(requests.get, args.videos, args.rounds)
+
+    session = create_session()
+    # 初回接続のハンドシェイクは計測から除外（常駐プロセスでは1回だけ発生する）
+    fetch_video(session.get, args.videos[0])
+    pooled = measure(session.get, args.videos, args.rounds)
+
+    report('requests.get', bare)
+    report('pooled Session', pooled)
+    saved = statistics.median(bare) - statistics.median(pooled)
+    print(f"1動画あたりの削減: {saved:.1f}ms（中央値）")
+
+
+if __name__ == '__main__':
+    main()
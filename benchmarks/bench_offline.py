@@ -0,0 +1,98 @@
+"""オフラインのステージ別ベンチマーク
+
+使い方:
+    python benchmarks/bench_offline.py [--repeat 5] [--videos 1 5 50] [--http-latency-ms 0] [--model-latency-ms 0]
+
+YouTubeへのHTTPは録画済み（なければ合成）のページ・字幕で応答し（replay.py）、Geminiは決定的な偽モデルに
+置き換えて、チャンネル動画一覧・検索・動画情報・字幕・企画案のパースと、タブ1の分析パイプライン全体
+（1/5/50動画）の時間を計る。--http-latency-ms / --model-latency-ms で回線とGeminiの待ち時間を足せる。
+キャッシュは一時ディレクトリに作り、毎回別の動画IDを使うのでキャッシュに当たらない状態を計る
+（パイプラインは同じ動画での2回目＝チェックポイント・共有キャッシュからの復元も計る）。ネットワーク不要。
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CHANNEL_URL = 'https://www.youtube.com/@fixture'
+
+
+def measure(fn, repeat: int) -> list:
+    """fn(round) を repeat 回実行した秒数"""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list, per: int = 0):
+    # 日本語のラベルは幅が揃わないので数値を先に出す
+    line = f"  median={statistics.median(timings) * 1000:9.1f} ms  min={min(timings) * 1000:9.1f} ms  {label}"
+    if per:
+        line += f"（{statistics.median(timings) * 1000 / per:.1f} ms/動画）"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--videos', type=int, nargs='+', default=[1, 5, 50], help='パイプラインに渡す動画数')
+    parser.add_argument('--channel-videos', type=int, default=500, help='ページ送りで取得するチャンネル動画数')
+    parser.add_argument('--http-latency-ms', type=float, default=0, help='1リクエストごとの待ち時間')
+    parser.add_argument('--model-latency-ms', type=float, default=0, help='Gemini呼び出し1回ごとの待ち時間')
+    parser.add_argument('--model-ms-per-1k', type=float, default=0, help='入力1000文字あたりに足すGeminiの待ち時間')
+    parser.add_argument('--rpm', type=int, default=100000, help='スケジューラのRPM上限（既定は実質無制限）')
+    args = parser.parse_args()
+
+    # 設定は import 時に読まれるので先に環境変数を決める（手元のキャッシュは使わない）
+    os.environ['TUBEHACKER_CACHE_DIR'] = tempfile.mkdtemp(prefix='tubehacker-bench-')
+    os.environ['TUBEHACKER_GEMINI_RPM'] = str(args.rpm)
+
+    import fixtures
+    import replay
+    from core import get_transcript, get_video_info, get_videos_from_channel, parse_ideas, search_youtube_videos
+    from jobs import Job, analysis_job
+
+    server = replay.Replay(latency=args.http_latency_ms / 1000)
+    replay.install(server)
+    model = replay.FakeGenerativeModel(latency=args.model_latency_ms / 1000, per_1k_tokens=args.model_ms_per_1k / 1000)
+    # 計測ごとに新しい動画ID（キャッシュに当たらない）。パイプラインは1万件ずつ離した連番を使う
+    fresh = itertools.count(100000)
+    batch_offsets = itertools.count(10000000, 10000)
+
+    print(f"HTTP待ち {args.http_latency_ms:.0f} ms / Gemini待ち {args.model_latency_ms:.0f} ms / repeat {args.repeat}")
+    print("取得・パース")
+    report("get_videos_from_channel（1ページ）", measure(lambda i: get_videos_from_channel(CHANNEL_URL, 30), args.repeat))
+    report(f"get_videos_from_channel（{args.channel_videos}件）",
+           measure(lambda i: get_videos_from_channel(CHANNEL_URL, args.channel_videos, paginate=True), args.repeat))
+    report("search_youtube_videos", measure(lambda i: search_youtube_videos('検証 再生数', 20), args.repeat))
+    report("get_video_info", measure(lambda i: get_video_info(fixtures.video_id(next(fresh))), args.repeat))
+    report("get_video_info（キャッシュ済み）", measure(lambda i: get_video_info(fixtures.video_id(0)), args.repeat))
+    report("get_transcript", measure(lambda i: get_transcript(fixtures.video_id(next(fresh))), args.repeat))
+    ideas = fixtures.ideas_text()
+    report("parse_ideas", measure(lambda i: parse_ideas(ideas), args.repeat))
+
+    print("タブ1の分析パイプライン（analysis_job）")
+    for n in args.videos:
+        batches = [replay.videos(n, next(batch_offsets)) for _ in range(args.repeat)]
+        requests_before, calls_before = server.requests, model.calls
+        cold = measure(lambda i: analysis_job(Job('analysis'), model, batches[i]), args.repeat)
+        report(f"{n}動画", cold, per=n)
+        print(f"    HTTPリクエスト {(server.requests - requests_before) / args.repeat:.0f} 回 / "
+              f"Gemini呼び出し {(model.calls - calls_before) / args.repeat:.0f} 回（1回あたり）")
+        report(f"{n}動画（2回目・分析済み）", measure(lambda i: analysis_job(Job('analysis'), model, batches[i]), args.repeat), per=n)
+
+    replay.uninstall()
+
+
+if __name__ == '__main__':
+    main()
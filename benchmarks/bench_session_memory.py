@@ -0,0 +1,153 @@
+"""セッションのメモリ: 分析結果N件を保持したときの1セッションあたりのバイト数
+
+使い方:
+    python benchmarks/bench_session_memory.py [--videos 5 20 50] [--transcript-chars 12000] [--analysis-chars 4000]
+
+st.session_state.analysis_results に入る形を3通り作って比較する。
+  - 従来の辞書: video_info にデコード済みのPILサムネイル（既定1280x720 RGB）
+  - 辞書（バイト列）: video_info に縮小済みJPEGのバイト列
+  - VideoResult: __slots__ + テキストはzlib圧縮、サムネイルはJPEGのバイト列
+オブジェクトをたどって sys.getsizeof を合計する（同じオブジェクトは1回だけ数える）。
+PIL画像はピクセルバッファ（幅×高さ×チャンネル数）として数える。ネットワーク不要。
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import VideoResult  # noqa: E402
+
+# 文字起こし・分析らしい文章を作るための語句
+_PHRASES = (
+    'えー', '今日は', 'みなさん', 'こんにちは', '実は', 'この方法を使うと', '再生数が', '3倍に', 'なりました',
+    'ポイントは', '最初の10秒で', '視聴者の', '興味を引く', 'ことです', 'つまり', 'サムネイルと', 'タイトルで',
+    '結論から言うと', '具体的には', 'ちなみに', 'チャンネル登録', 'よろしくお願いします', 'では', '次に',
+    '【フック】', '【構成】', '【CTA】', '共感', '意外性', '数字を入れる', '問いかけ', 'まとめると',
+)
+
+
+def synthetic_text(rng: random.Random, chars: int) -> str:
+    parts = []
+    length = 0
+    while length < chars:
+        phrase = rng.choice(_PHRASES) + rng.choice(('、', '。', '', '\n'))
+        parts.append(phrase)
+        length += len(phrase)
+    return ''.join(parts)[:chars]
+
+
+class DecodedImage:
+    """PILのImageの代わり（ピクセルバッファの大きさだけを持つ）"""
+
+    def __init__(self, width: int, height: int, bands: int = 3):
+        self.size = (width, height)
+        self.nbytes = width * height * bands
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, DecodedImage):
+        return sys.getsizeof(obj) + obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, name, None), seen) for name in obj.__slots__)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+def make_fields(rng: random.Random, i: int, args) -> dict:
+    video_id = f"vid{i:08d}"
+    return {
+        'video_id': video_id,
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'title': f"【検証】動画タイトル{i} ～これで再生数が3倍に～",
+        'thumbnail_url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'thumbnail': rng.randbytes(args.thumbnail_kb * 1024),  # JPEGはほぼ圧縮できないのでランダムで代用
+        'transcript': synthetic_text(rng, args.transcript_chars),
+        'analysis': synthetic_text(rng, args.analysis_chars),
+    }
+
+
+def legacy_dict(fields: dict, decoded: tuple) -> dict:
+    return {
+        'success': True,
+        'analysis': fields['analysis'],
+        'video_info': {
+            'title': fields['title'],
+            'thumbnail_url': fields['thumbnail_url'],
+            'thumbnail_image': DecodedImage(*decoded),
+            'video_id': fields['video_id'],
+            'url': fields['url'],
+            'is_shorts': False,
+        },
+        'has_transcript': True,
+        'transcript': fields['transcript'],
+        'char_count': len(fields['transcript']),
+        'is_shorts': False,
+    }
+
+
+def bytes_dict(fields: dict) -> dict:
+    result = legacy_dict(fields, (0, 0))
+    video_info = result['video_info']
+    del video_info['thumbnail_image']
+    video_info['thumbnail_bytes'] = fields['thumbnail']
+    video_info['thumbnail_size'] = (480, 270)
+    return result
+
+
+def video_result(fields: dict) -> VideoResult:
+    return VideoResult(
+        video_id=fields['video_id'],
+        url=fields['url'],
+        title=fields['title'],
+        thumbnail_url=fields['thumbnail_url'],
+        thumbnail=fields['thumbnail'],
+        thumbnail_size=(480, 270),
+        success=True,
+        has_transcript=True,
+        char_count=len(fields['transcript']),
+        analysis=fields['analysis'],
+        transcript=fields['transcript'],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, nargs='+', default=[5, 20, 50])
+    parser.add_argument('--transcript-chars', type=int, default=12000)
+    parser.add_argument('--analysis-chars', type=int, default=4000)
+    parser.add_argument('--thumbnail-kb', type=int, default=40, help='縮小済みJPEGの大きさ')
+    parser.add_argument('--legacy-thumbnail', default='1280x720', help='従来のデコード済みサムネイルの解像度')
+    args = parser.parse_args()
+    decoded = tuple(int(v) for v in args.legacy_thumbnail.split('x'))
+
+    print(f"文字起こし{args.transcript_chars}文字 / 分析{args.analysis_chars}文字 / JPEG {args.thumbnail_kb}KB")
+    print(f"  {'動画数':>6} {'従来の辞書':>14} {'辞書（バイト列）':>14} {'VideoResult':>14} {'削減率':>8}")
+    for n in args.videos:
+        rng = random.Random(n)
+        fields = [make_fields(rng, i, args) for i in range(n)]
+        legacy = deep_sizeof([legacy_dict(f, decoded) for f in fields])
+        current = deep_sizeof([bytes_dict(f) for f in fields])
+        compact = deep_sizeof([video_result(f) for f in fields])
+        print(f"  {n:>6} {legacy / 1024:>12.0f}KB {current / 1024:>12.0f}KB {compact / 1024:>12.0f}KB {1 - compact / legacy:>7.1%}")
+
+    # 圧縮の代わりに読むたびに展開するコスト
+    result = video_result(make_fields(random.Random(0), 0, args))
+    seconds = min(timeit.repeat(lambda: result.analysis, number=200, repeat=5)) / 200
+    print(f"analysis の展開: {seconds * 1e6:.0f} µs/回")
+
+
+if __name__ == '__main__':
+    main()
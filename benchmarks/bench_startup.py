@@ -0,0 +1,90 @@
+"""起動時間: モジュールのimport時間と、最初の描画までの時間
+
+使い方:
+    python benchmarks/bench_startup.py [--repeat 5] [--max-render-ms 3000]
+
+毎回新しいPythonプロセスで計測する（importのキャッシュが効かない状態＝コンテナ起動直後に相当）。
+最初の描画は streamlit.testing の AppTest で app.py を1回実行した時間。
+重いSDK（google.generativeai など）が読み込まれたかどうかも表示する。
+--max-render-ms を超えたら終了コード1を返すので、CIで起動時間の悪化を検出できる。ネットワーク不要。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時には読み込まれないはずのモジュール
+HEAVY_MODULES = ('google.generativeai', 'youtube_transcript_api', 'PIL', 'requests', 'yt_dlp', 'bs4')
+
+_IMPORT_SNIPPET = """
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_RENDER_SNIPPET = """
+import json, logging, sys, time, warnings
+warnings.simplefilter('ignore')
+logging.disable(logging.CRITICAL)
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60)
+if {api_key!r}:
+    at.session_state.api_key = {api_key!r}
+at.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules],
+                  'exceptions': [str(e.value) for e in at.exception]}}))
+"""
+
+
+def _run(code: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(code: str, repeat: int) -> dict:
+    """repeat回計測して最小値を採用（loadedなどは最後の回）"""
+    runs = [_run(code) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r['seconds'])
+    return {**runs[-1], 'seconds': best['seconds']}
+
+
+def _report(label: str, result: dict):
+    loaded = ', '.join(result['loaded']) or '-'
+    print(f"  {label:<28} {result['seconds'] * 1000:8.1f} ms  重いSDK: {loaded}")
+    for error in result.get('exceptions', []):
+        print(f"    例外: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-render-ms', type=float, default=0, help='最初の描画（APIキーなし）の上限。超えたら終了コード1')
+    args = parser.parse_args()
+
+    print("import時間")
+    for module in ('streamlit', 'core', 'jobs', 'google.generativeai'):
+        _report(f"import {module}", measure(_IMPORT_SNIPPET.format(root=ROOT, module=module, heavy=HEAVY_MODULES), args.repeat))
+
+    print("最初の描画（AppTest）")
+    app = os.path.join(ROOT, 'app.py')
+    cold = measure(_RENDER_SNIPPET.format(root=ROOT, app=app, api_key='', heavy=HEAVY_MODULES), args.repeat)
+    _report("APIキーなし", cold)
+    _report("APIキーあり", measure(_RENDER_SNIPPET.format(root=ROOT, app=app, api_key='dummy', heavy=HEAVY_MODULES), args.repeat))
+
+    if args.max_render_ms and cold['seconds'] * 1000 > args.max_render_ms:
+        print(f"最初の描画が上限（{args.max_render_ms:.0f} ms）を超えました")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""視聴ページのタイトル取得: 従来のBeautifulSoup全体パース vs ストリーム読み込み
+
+使い方:
+    python benchmarks/bench_watch_title.py [--repeat 10] [--chunk-size 16384]
+
+1動画あたりの読み込みバイト数とパース時間を比較する。従来方式の計測には
+beautifulsoup4 が必要（pip install beautifulsoup4）。ネットワーク不要。
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+from yt_parser import extract_watch_title  # noqa: E402
+
+
+def legacy_title(content: bytes) -> str:
+    """変更前の get_video_info と同じタイトル取得（og:title → <title>）"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content.decode('utf-8'), 'html.parser')
+    tag = soup.find('meta', property='og:title')
+    if tag and tag.get('content'):
+        return tag['content']
+    element = soup.find('title')
+    return element.text.replace(' - YouTube', '').strip() if element else None
+
+
+def chunked(content: bytes, size: int):
+    for i in range(0, len(content), size):
+        yield content[i:i + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--chunk-size', type=int, default=16384)
+    args = parser.parse_args()
+
+    page = fixtures.load('watch')
+    title, bytes_read = extract_watch_title(chunked(page, args.chunk_size))
+    print(f"watch page: {len(page):,} bytes  title={title!r}")
+
+    streamed = min(timeit.repeat(lambda: extract_watch_title(chunked(page, args.chunk_size)), number=1, repeat=args.repeat))
+    print(f"  streamed      read={bytes_read:>10,} bytes  parse={streamed * 1000:8.2f} ms")
+    try:
+        legacy = min(timeit.repeat(lambda: legacy_title(page), number=1, repeat=args.repeat))
+        print(f"  BeautifulSoup read={len(page):>10,} bytes  parse={legacy * 1000:8.2f} ms")
+    except ImportError:
+        print("  BeautifulSoup: beautifulsoup4 未インストールのため省略")
+
+
+if __name__ == '__main__':
+    main()
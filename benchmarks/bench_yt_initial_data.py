@@ -0,0 +1,58 @@
+"""ytInitialData抽出のマイクロベンチマーク（従来の非貪欲正規表現 vs yt_parser）
+
+使い方:
+    python benchmarks/bench_yt_initial_data.py [--repeat 20]
+
+benchmarks/fixtures/ の録画ページ（なければ合成ページ）を使う。ネットワーク不要。
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+from yt_parser import extract_yt_initial_data  # noqa: E402
+
+
+def legacy_extract(content: bytes):
+    """変更前の get_videos_from_channel と同じ抽出処理"""
+    text = content.decode('utf-8')
+    match = re.search(r'var ytInitialData = ({.*?});', text)
+    if not match:
+        match = re.search(r'ytInitialData\s*=\s*({.*?});', text)
+    if not match:
+        match = re.search(r'window\["ytInitialData"\]\s*=\s*({.*?});', text)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for name in ('channel', 'search', 'watch'):
+        page = fixtures.load(name)
+        # 文字列中の "};" を除いた版（従来方式が成功するケースの計測用）
+        clean = page.replace(b'{a: 1}; ', b'')
+        print(f"[{name}] {len(page):,} bytes  従来方式で抽出可能: {legacy_extract(page) is not None}"
+              f"  yt_parser: {extract_yt_initial_data(page) is not None}")
+        for label, fn in (
+            ('legacy regex', lambda: legacy_extract(clean)),
+            ('decode+raw_decode', lambda: extract_yt_initial_data(clean.decode('utf-8'))),
+            ('bytes', lambda: extract_yt_initial_data(clean)),
+        ):
+            best = min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+            print(f"  {label:<18} {best:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""ベンチマーク用のYouTubeページフィクスチャ
+
+benchmarks/fixtures/ に録画済みページ（channel.html / search.html / watch.html）と字幕（transcript.json）が
+あればそれを使い、なければ実ページと同じ構造・サイズの合成データを決定的に生成する。
+
+録画:
+    python benchmarks/fixtures.py record --channel https://www.youtube.com/@xxx --video VIDEO_ID --query 検索語
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_HEAD_JS = 'var ytcfg={d:function(){return window.yt&&yt.config_||ytcfg.data_||(ytcfg.data_={})}};' * 400
+
+
+def _rand_token(rng: random.Random, n: int) -> str:
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+    return ''.join(rng.choice(alphabet) for _ in range(n))
+
+
+def video_id(i: int) -> str:
+    """フィクスチャ内の i 番目の動画ID（11文字）"""
+    return f"vid{i:08d}"
+
+
+def _video_renderer(rng: random.Random, i: int) -> dict:
+    vid = video_id(i)
+    return {
+        'videoId': vid,
+        'thumbnail': {'thumbnails': [
+            {'url': f'https://i.ytimg.com/vi/{vid}/hqdefault.jpg?sqp={_rand_token(rng, 40)}', 'width': w, 'height': h}
+            for w, h in ((168, 94), (196, 110), (246, 138), (336, 188))
+        ]},
+        'title': {'runs': [{'text': f'【検証】動画タイトル{i} ～これで再生数が3倍に～'}],
+                  'accessibility': {'accessibilityData': {'label': f'動画タイトル{i} 作成者: テスト 1 日前 12 分'}}},
+        # 文字列中の "};" で非貪欲正規表現が途中終了するケースを含める
+        'descriptionSnippet': {'runs': [{'text': f'説明文{i} const x = {{a: 1}}; 続き'}]},
+        'publishedTimeText': {'simpleText': f'{i + 1} 日前'},
+        'lengthText': {'simpleText': '12:34'},
+        'viewCountText': {'simpleText': f'{rng.randint(1000, 10 ** 7):,} 回視聴'},
+        'navigationEndpoint': {
+            'clickTrackingParams': _rand_token(rng, 60),
+            'commandMetadata': {'webCommandMetadata': {'url': f'/watch?v={vid}', 'webPageType': 'WEB_PAGE_TYPE_WATCH'}},
+            'watchEndpoint': {'videoId': vid, 'watchEndpointSupportedOnesieConfig': {
+                'html5PlaybackOnesieConfig': {'commonConfig': {'url': f'https://rr1---sn-{_rand_token(rng, 8)}.googlevideo.com/initplayback'}}}},
+        },
+        'trackingParams': _rand_token(rng, 80),
+        'menu': {'menuRenderer': {'items': [
+            {'menuServiceItemRenderer': {'text': {'runs': [{'text': t}]}, 'trackingParams': _rand_token(rng, 40)}}
+            for t in ('キューに追加', '後で見る', '再生リストに保存', '共有')
+        ]}},
+        'thumbnailOverlays': [
+            {'thumbnailOverlayTimeStatusRenderer': {'text': {'simpleText': '12:34'}, 'style': 'DEFAULT'}},
+            {'thumbnailOverlayToggleButtonRenderer': {'untoggledTooltip': '後で見る', 'trackingParams': _rand_token(rng, 40)}},
+        ],
+    }
+
+
+def _filler(rng: random.Random, n: int) -> list:
+    """動画を含まない巨大なサブツリー（frameworkUpdatesなど）"""
+    return [{'entityKey': _rand_token(rng, 40), 'payload': {'mutation': {'value': _rand_token(rng, 200)}}} for _ in range(n)]
+
+
+def initial_data_channel(n_videos: int = 30, continuation: bool = True, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    items = [{'richItemRenderer': {'content': {'videoRenderer': _video_renderer(rng, i)}, 'trackingParams': _rand_token(rng, 40)}}
+             for i in range(n_videos)]
+    if continuation:
+        items.append({'continuationItemRenderer': {
+            'trigger': 'CONTINUATION_TRIGGER_ON_ITEM_SHOWN',
+            'continuationEndpoint': {'continuationCommand': {'token': 'CONT_1', 'request': 'CONTINUATION_REQUEST_TYPE_BROWSE'}},
+        }})
+    return {
+        'responseContext': {'serviceTrackingParams': [{'service': 'GFEEDBACK', 'params': [{'key': 'e', 'value': _rand_token(rng, 400)}]}]},
+        'contents': {'twoColumnBrowseResultsRenderer': {'tabs': [
+            {'tabRenderer': {'title': 'ホーム', 'selected': False, 'trackingParams': _rand_token(rng, 40)}},
+            {'tabRenderer': {'title': '動画', 'selected': True, 'content': {'richGridRenderer': {'contents': items}}}},
+        ]}},
+        'header': {'c4TabbedHeaderRenderer': {'title': 'テストチャンネル', 'avatar': {'thumbnails': [{'url': 'https://yt3.ggpht.com/x'}]}}},
+        'topbar': {'desktopTopbarRenderer': {'trackingParams': _rand_token(rng, 40), 'hotkeyDialog': _filler(rng, 50)}},
+        'frameworkUpdates': {'entityBatchUpdate': {'mutations': _filler(rng, 3000)}},
+    }
+
+
+def continuation_response(page: int, n_videos: int = 30, last: bool = False, seed: int = 2) -> dict:
+    """browse API の継続ページのレスポンス"""
+    rng = random.Random(seed + page)
+    items = [{'richItemRenderer': {'content': {'videoRenderer': _video_renderer(rng, page * n_videos + i)}}}
+             for i in range(n_videos)]
+    if not last:
+        items.append({'continuationItemRenderer': {'continuationEndpoint': {
+            'continuationCommand': {'token': f'CONT_{page + 1}', 'request': 'CONTINUATION_REQUEST_TYPE_BROWSE'}}}})
+    return {
+        'responseContext': {'visitorData': _rand_token(rng, 40)},
+        'onResponseReceivedActions': [{'appendContinuationItemsAction': {'continuationItems': items, 'targetId': 'browse-feed'}}],
+    }
+
+
+def initial_data_search(n_videos: int = 20, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    items = [{'videoRenderer': _video_renderer(rng, 1000 + i)} for i in range(n_videos)]
+    return {
+        'responseContext': {'serviceTrackingParams': [{'service': 'CSI', 'params': [{'key': 'c', 'value': 'WEB'}]}]},
+        'contents': {'twoColumnSearchResultsRenderer': {'primaryContents': {'sectionListRenderer': {'contents': [
+            {'itemSectionRenderer': {'contents': items}},
+        ]}}}},
+        'frameworkUpdates': {'entityBatchUpdate': {'mutations': _filler(rng, 1500)}},
+    }
+
+
+def _html(head: str, body_scripts: list) -> bytes:
+    scripts = ''.join(f'<script nonce="abc">{s}</script>' for s in body_scripts)
+    return (
+        '<!DOCTYPE html><html style="font-size: 10px;font-family: Roboto, Arial, sans-serif;" lang="ja-JP">'
+        f'<head>{head}</head><body dir="ltr">{scripts}</body></html>'
+    ).encode('utf-8')
+
+
+def _ytcfg() -> str:
+    cfg = {'INNERTUBE_API_KEY': 'AIzaFixtureKey', 'INNERTUBE_CLIENT_VERSION': '2.20240101.00.00', 'INNERTUBE_CLIENT_NAME': 'WEB'}
+    return f'ytcfg.set({json.dumps(cfg)});'
+
+
+def channel_page(n_videos: int = 30) -> bytes:
+    data = initial_data_channel(n_videos)
+    head = f'<title>テストチャンネル - YouTube</title><script nonce="abc">{_HEAD_JS}</script>'
+    return _html(head, [_ytcfg(), _HEAD_JS, f'var ytInitialData = {json.dumps(data, ensure_ascii=False)};'])
+
+
+def search_page(n_videos: int = 20) -> bytes:
+    data = initial_data_search(n_videos)
+    head = f'<title>検索 - YouTube</title><script nonce="abc">{_HEAD_JS}</script>'
+    return _html(head, [_ytcfg(), _HEAD_JS, f'var ytInitialData = {json.dumps(data, ensure_ascii=False)};'])
+
+
+def watch_page(vid: str = 'vid00000000', title: str = '【検証】動画タイトル0 ～これで再生数が3倍に～') -> bytes:
+    rng = random.Random(4)
+    escaped = title.replace('"', '&quot;')
+    head = (
+        f'<script nonce="abc">{_HEAD_JS}</script>'
+        f'<title>{escaped} - YouTube</title>'
+        f'<meta name="title" content="{escaped}">'
+        f'<meta property="og:title" content="{escaped}">'
+        f'<meta property="og:image" content="https://i.ytimg.com/vi/{vid}/maxresdefault.jpg">'
+        f'<link rel="stylesheet" href="https://www.youtube.com/s/desktop/{_rand_token(rng, 8)}/cssbin/www-main-desktop-watch-page-skeleton.css">'
+    )
+    player = {'videoDetails': {'videoId': vid, 'title': title, 'lengthSeconds': '754', 'shortDescription': 'x' * 2000},
+              'streamingData': {'adaptiveFormats': [{'url': f'https://rr1.googlevideo.com/{_rand_token(rng, 300)}'} for _ in range(40)]},
+              'playerConfig': _filler(rng, 200)}
+    ld = {'@context': 'http://schema.org', '@type': 'VideoObject', 'name': title}
+    body = [
+        _ytcfg(),
+        f'var ytInitialPlayerResponse = {json.dumps(player, ensure_ascii=False)};',
+        f'var ytInitialData = {json.dumps(initial_data_channel(20, False, seed=5), ensure_ascii=False)};',
+    ]
+    page = _html(head, body)
+    return page.replace(b'</body>', f'<script type="application/ld+json">{json.dumps(ld, ensure_ascii=False)}</script></body>'.encode('utf-8'))
+
+
+_TRANSCRIPT_PHRASES = (
+    'えー今日は', 'みなさんこんにちは', '実はこの方法を使うと', '再生数が3倍になりました', 'ポイントは',
+    '最初の10秒で視聴者の興味を引くことです', 'つまり', 'サムネイルとタイトルで', '結論から言うと',
+    '具体的には', 'ちなみに', 'チャンネル登録よろしくお願いします', 'では次に', '[音楽]', 'まとめると',
+)
+
+
+def transcript_entries(n_entries: int = 400, seed: int = 6) -> list:
+    """字幕の1行ずつ（youtube_transcript_api の to_raw_data と同じ形）。既定で約13分・7千文字"""
+    rng = random.Random(seed)
+    entries = []
+    start = 0.0
+    for _ in range(n_entries):
+        duration = round(rng.uniform(1.0, 3.0), 2)
+        text = ''.join(rng.choice(_TRANSCRIPT_PHRASES) for _ in range(rng.randint(1, 3)))
+        entries.append({'text': text, 'start': round(start, 2), 'duration': duration})
+        start += duration
+    return entries
+
+
+def load_transcript() -> list:
+    """録画済みの字幕があれば読み込み、なければ合成した字幕を返す"""
+    path = os.path.join(FIXTURE_DIR, 'transcript.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return transcript_entries()
+
+
+def thumbnail_jpeg(width: int = 1280, height: int = 720, seed: int = 7) -> bytes:
+    """サムネイル相当のJPEG（グラデーション + ノイズ。Pillowが必要）"""
+    from io import BytesIO
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    noise = Image.frombytes('L', (width // 4, height // 4), rng.randbytes((width // 4) * (height // 4)))
+    image.paste(noise.convert('RGB'), (width // 8, height // 8))
+    out = BytesIO()
+    image.save(out, format='JPEG', quality=85)
+    return out.getvalue()
+
+
+def ideas_text(tag: str = '') -> str:
+    """企画案の生成結果（parse_ideas が読む形式）"""
+    plans = []
+    for n in (1, 2, 3):
+        plans.append(
+            f"## 企画案{n}\n### タイトル案\n"
+            + ''.join(f"{i}. 【検証{tag}】企画{n}のタイトル案{i} ～再生数が伸びる理由～\n" for i in (1, 2, 3))
+            + "### 想定される視聴者の悩み\n- 再生数が伸びない\n- 何を撮ればいいか分からない\n"
+            + f"### サムネイル構成案\n- メインテキスト: 「企画{n}の結論」\n- 配色: 黄色×黒\n"
+            + "### 台本構成案\n- 冒頭フック: 結論から\n- 本題: 具体例3つ\n- CTA: 最後に登録を促す\n"
+        )
+    return '\n'.join(plans)
+
+
+def load(name: str) -> bytes:
+    """録画済みフィクスチャがあれば読み込み、なければ合成ページを返す"""
+    path = os.path.join(FIXTURE_DIR, f'{name}.html')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return {'channel': channel_page, 'search': search_page, 'watch': watch_page}[name]()
+
+
+def record(channel: str, video: str, query: str):
+    """実ページを取得して benchmarks/fixtures/ に保存（ネットワーク必須）"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from http_client import http_get
+    from urllib.parse import quote
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    targets = {
+        'channel': channel.rstrip('/') + '/videos',
+        'watch': f'https://www.youtube.com/watch?v={video}',
+        'search': f'https://www.youtube.com/results?search_query={quote(query)}',
+    }
+    for name, url in targets.items():
+        content = http_get(url, timeout=20).content
+        with open(os.path.join(FIXTURE_DIR, f'{name}.html'), 'wb') as f:
+            f.write(content)
+        print(f'{name}: {len(content):,} bytes <- {url}')
+
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    entries = YouTubeTranscriptApi().fetch(video, languages=['ja', 'en']).to_raw_data()
+    with open(os.path.join(FIXTURE_DIR, 'transcript.json'), 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+    print(f'transcript: {len(entries)} lines <- {video}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record')
+    rec.add_argument('--channel', required=True)
+    rec.add_argument('--video', required=True)
+    rec.add_argument('--query', required=True)
+    args = parser.parse_args()
+    record(args.channel, args.video, args.query)
@@ -0,0 +1,188 @@
+"""オフライン再生: YouTubeへのHTTPをフィクスチャで応答し、Geminiを決定的な偽モデルに置き換える
+
+install() で requests の HTTPAdapter.send を差し替えるので、共有Session（http_client）も
+youtube_transcript_api が内部で作るSessionも、実際のパース処理を通ったままフィクスチャを受け取る。
+登録していないURLは ConnectionError になり、ネットワークには一切出ない。
+"""
+import hashlib
+import io
+import json
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import fixtures
+from yt_parser import extract_watch_title
+
+# 字幕の先頭に入れた動画IDの置き換え位置
+_VIDEO = '__VIDEO_ID__'
+
+
+def _transcript_xml(entries: list) -> bytes:
+    lines = ''.join(
+        f'<text start="{e["start"]}" dur="{e["duration"]}">{escape(e["text"])}</text>' for e in entries
+    )
+    return f'<?xml version="1.0" encoding="utf-8" ?><transcript>{lines}</transcript>'.encode('utf-8')
+
+
+def _player_response(video_id: str) -> bytes:
+    """youtube_transcript_api が字幕一覧を取得する player API の応答"""
+    track = {
+        'baseUrl': f'https://www.youtube.com/api/timedtext?v={video_id}&lang=ja',
+        'name': {'runs': [{'text': '日本語'}]},
+        'languageCode': 'ja',
+        'isTranslatable': False,
+    }
+    data = {
+        'playabilityStatus': {'status': 'OK'},
+        'captions': {'playerCaptionsTracklistRenderer': {'captionTracks': [track], 'translationLanguages': []}},
+    }
+    return json.dumps(data).encode('utf-8')
+
+
+class Replay:
+    """URLごとにフィクスチャを返す。1リクエストごとに latency 秒待つ（回線の往復の代わり）"""
+
+    def __init__(self, latency: float = 0.0, channel_pages: int = 20):
+        self.latency = latency
+        self.channel_pages = channel_pages
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._pages = {name: fixtures.load(name) for name in ('watch', 'channel', 'search')}
+        # 動画ごとに別の入力になるよう、視聴ページのタイトルと字幕の先頭に動画IDを入れて返す
+        title, _ = extract_watch_title([self._pages['watch']])
+        self._title = (title or '').encode('utf-8')
+        entries = fixtures.load_transcript()
+        self._transcript = _transcript_xml([{**entries[0], 'text': f"{_VIDEO} {entries[0]['text']}"}] + entries[1:])
+        self._thumbnails = {'maxresdefault': fixtures.thumbnail_jpeg(1280, 720), 'hqdefault': fixtures.thumbnail_jpeg(480, 360)}
+
+    def respond(self, method: str, url: str, body) -> tuple:
+        """(ステータス, 本文, Content-Type)"""
+        parsed = urlparse(url)
+        path = parsed.path
+        if parsed.netloc == 'img.youtube.com':
+            name = path.rsplit('/', 1)[-1].split('.')[0]
+            data = self._thumbnails.get(name)
+            return (200, data, 'image/jpeg') if data else (404, b'', 'text/html')
+        if path == '/watch':
+            video_id = parse_qs(parsed.query).get('v', [''])[0].encode('utf-8')
+            page = self._pages['watch'].replace(self._title, self._title + b' ' + video_id) if self._title else self._pages['watch']
+            return 200, page, 'text/html; charset=utf-8'
+        if path == '/results':
+            return 200, self._pages['search'], 'text/html; charset=utf-8'
+        if path.endswith('/videos'):
+            return 200, self._pages['channel'], 'text/html; charset=utf-8'
+        if path == '/youtubei/v1/browse':
+            token = json.loads(body)['continuation']
+            page = int(token.rsplit('_', 1)[-1])
+            data = fixtures.continuation_response(page, last=page >= self.channel_pages)
+            return 200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json'
+        if path == '/youtubei/v1/player':
+            return 200, _player_response(json.loads(body)['videoId']), 'application/json'
+        if path == '/api/timedtext':
+            video_id = parse_qs(parsed.query).get('v', [''])[0]
+            return 200, self._transcript.replace(_VIDEO.encode('utf-8'), video_id.encode('utf-8')), 'text/xml; charset=utf-8'
+        return None
+
+    def send(self, adapter, request, stream=False, timeout=None, **kwargs):
+        import requests
+
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        reply = self.respond(request.method, request.url, request.body)
+        if reply is None:
+            raise requests.ConnectionError(f"オフライン: フィクスチャがありません {request.method} {request.url}", request=request)
+        status, content, content_type = reply
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers['Content-Type'] = content_type
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8' if 'charset=utf-8' in content_type else None
+        response.connection = adapter
+        return response
+
+
+_installed = None
+
+
+def install(replay: Replay):
+    """requests の全送信を replay で応答する（元に戻すのは uninstall）"""
+    global _installed
+    from requests.adapters import HTTPAdapter
+
+    if _installed is None:
+        _installed = HTTPAdapter.send
+    HTTPAdapter.send = lambda adapter, request, **kwargs: replay.send(adapter, request, **kwargs)
+
+
+def uninstall():
+    global _installed
+    from requests.adapters import HTTPAdapter
+
+    if _installed is not None:
+        HTTPAdapter.send = _installed
+        _installed = None
+
+
+class FakeGenerativeModel:
+    """model.generate_content / count_tokens と同じ呼び出し方の決定的な偽モデル
+
+    応答はプロンプトのハッシュから作るので同じ入力には同じ出力を返す。
+    latency 秒 + 入力1000トークンあたり per_1k_tokens 秒待ってから返す。
+    stream=True ならチャンクに分けて返す（チャンクの間にも待ち時間を分配）。
+    """
+
+    def __init__(self, latency: float = 0.0, per_1k_tokens: float = 0.0, output_chars: int = 2000,
+                 model_name: str = 'models/fake-gemini'):
+        self.model_name = model_name
+        self.latency = latency
+        self.per_1k_tokens = per_1k_tokens
+        self.output_chars = output_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prompt(contents) -> str:
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        return '\n'.join(p for p in parts if isinstance(p, str))
+
+    def _text(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        if '企画案' in prompt:
+            return fixtures.ideas_text(digest[:8])
+        line = f"## 分析 {digest[:8]}\n- フック: 冒頭で結論を提示\n- 構成: 問題提起→具体例→CTA\n"
+        return (line * (self.output_chars // len(line) + 1))[:self.output_chars]
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt = self._prompt(contents)
+        delay = self.latency + self.per_1k_tokens * len(prompt) / 1000
+        text = self._text(prompt)
+        if not stream:
+            time.sleep(delay)
+            return SimpleNamespace(text=text)
+        return self._stream(text, delay)
+
+    def _stream(self, text: str, delay: float, chunks: int = 8):
+        size = len(text) // chunks + 1
+        for i in range(0, len(text), size):
+            time.sleep(delay / chunks)
+            yield SimpleNamespace(text=text[i:i + size])
+
+    def count_tokens(self, contents):
+        return SimpleNamespace(total_tokens=len(self._prompt(contents)))
+
+
+def videos(n: int, offset: int = 0) -> list:
+    """パイプラインに渡す動画（offsetを変えると各キャッシュに当たらない別の動画になる）"""
+    ids = [fixtures.video_id(offset + i) for i in range(n)]
+    return [{'video_id': vid, 'url': f'https://www.youtube.com/watch?v={vid}'} for vid in ids]
+
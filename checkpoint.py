@@ -0,0 +1,144 @@
+"""動画ごとの分析結果のチェックポイント（SQLite）
+
+分析が終わった動画の結果をその場で保存し、同じURLの組み合わせを再実行したときは
+保存済みの動画を飛ばして残りだけを分析する。429での失敗・停止・コンテナ再起動の後でも、
+完了済みの動画のGemini呼び出しをやり直さない。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core import run_analysis_pipeline
+from models import VideoResult
+from video_cache import CACHE_DIR
+
+CHECKPOINT_TTL = int(os.environ.get('TUBEHACKER_CHECKPOINT_TTL', str(7 * 24 * 3600)))  # 秒
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    batch_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    result TEXT NOT NULL,
+    thumbnail BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (batch_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created ON checkpoints (created_at);
+"""
+
+
+def batch_id(videos: List[dict]) -> str:
+    """URLの組み合わせ（順番・重複は問わない）から決まるバッチID"""
+    video_ids = sorted({v['video_id'] for v in videos})
+    return hashlib.sha256('\n'.join(video_ids).encode('utf-8')).hexdigest()[:32]
+
+
+class CheckpointStore:
+    """バッチID・video_idごとに成功した分析結果を保存する"""
+
+    def __init__(self, path: str, ttl: float = CHECKPOINT_TTL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def completed(self, batch: str) -> Dict[str, VideoResult]:
+        """保存済みの結果を video_id -> result で返す"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT video_id, result, thumbnail FROM checkpoints WHERE batch_id = ? AND created_at >= ?',
+                (batch, time.time() - self.ttl)
+            ).fetchall()
+        completed = {}
+        for video_id, payload, thumbnail in rows:
+            completed[video_id] = VideoResult.from_record(json.loads(payload), thumbnail)
+        return completed
+
+    def put(self, batch: str, video_id: str, result: VideoResult):
+        """成功した結果をすぐに書き込む（サムネイルはJSONに入れずBLOBで保存）"""
+        payload = json.dumps(result.to_record(include_transcript=True), ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)',
+                (batch, video_id, payload, result.thumbnail, now)
+            )
+            self._conn.execute('DELETE FROM checkpoints WHERE created_at < ?', (now - self.ttl,))
+
+    def clear(self, batch: Optional[str] = None):
+        with self._lock:
+            if batch is None:
+                self._conn.execute('DELETE FROM checkpoints')
+            else:
+                self._conn.execute('DELETE FROM checkpoints WHERE batch_id = ?', (batch,))
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """プロセス共有のチェックポイントを取得（初回のみ作成）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore(os.path.join(CACHE_DIR, 'checkpoints.sqlite3'))
+    return _store
+
+
+def run_resumable_pipeline(
+    model,
+    videos: List[dict],
+    resume: bool = True,
+    store: Optional[CheckpointStore] = None,
+    ordered: bool = True,
+    **kwargs,
+) -> Iterator[Tuple[int, VideoResult]]:
+    """run_analysis_pipeline と同じく (index, result) を入力順に返す（ordered=Falseなら保存済み→完了順）
+
+    分析は常に完了順で受け取り、終わった動画はその場で保存する（前の動画の分析が
+    長引いていても、後の動画の結果を停止・再起動で失わないようにする）。
+    resume=False なら保存済みの結果は使わない（新しい結果で上書きされる）。
+    その他の引数は run_analysis_pipeline に渡す。
+    """
+    store = store or get_checkpoint_store()
+    batch = batch_id(videos)
+    completed = store.completed(batch) if resume else {}
+
+    pending = {}  # ordered のときに入力順を待つ結果
+    next_index = 0
+    remaining = []
+    for i, video in enumerate(videos):
+        if video['video_id'] in completed:
+            pending[i] = completed[video['video_id']]
+        else:
+            remaining.append(i)
+
+    if not ordered:
+        yield from pending.items()
+        pending.clear()
+
+    for j, result in run_analysis_pipeline(model, [videos[i] for i in remaining], ordered=False, **kwargs):
+        i = remaining[j]
+        if result.success:
+            store.put(batch, videos[i]['video_id'], result)
+        if not ordered:
+            yield i, result
+            continue
+        pending[i] = result
+        while next_index in pending:
+            yield next_index, pending.pop(next_index)
+            next_index += 1
+
+    # 停止されたときは揃わなかった分を除いて入力順に返す
+    for i in sorted(pending):
+        yield i, pending[i]
@@ -0,0 +1,230 @@
+"""共通パターンのコンテキストキャッシュ
+
+企画案・台本の生成では毎回同じ共通パターンを送るため、抽出ごとに1回だけ
+Geminiのコンテキストキャッシュ（CachedContent）に登録し、以降の呼び出しはそれを参照する。
+ContextModel は model.generate_content と同じインターフェースなので、
+generate_text / stream_text にそのまま渡せる。
+
+バックエンドは環境変数 TUBEHACKER_CONTEXT_CACHE で切り替える。
+- gemini: CachedContentを使う（作成に失敗した場合や短すぎる場合、モデルのAPIキーが分からない場合はinlineにフォールバック）
+- local: オフライン検証用の代替。内容を手元に保持して各リクエストの先頭に付ける
+- off: 常にinline（毎回プロンプトの先頭に付けて送る）
+"""
+import datetime
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+
+from gemini_client import GeminiClients, clients_of
+from prompt_budget import estimate_tokens
+from shared_cache import SharedCache
+
+CONTEXT_CACHE_BACKEND = os.environ.get('TUBEHACKER_CONTEXT_CACHE', 'gemini')
+# セッションの想定継続時間。期限の半分を切ったら使用時に延長する
+CONTEXT_CACHE_TTL = int(os.environ.get('TUBEHACKER_CONTEXT_CACHE_TTL', '3600'))  # 秒
+# キャッシュの作成にはバージョンつきのモデル名が必要
+CONTEXT_CACHE_MODEL = os.environ.get('TUBEHACKER_CONTEXT_CACHE_MODEL', 'models/gemini-2.0-flash-001')
+# これより短い内容はGemini側でキャッシュできない
+CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get('TUBEHACKER_CONTEXT_CACHE_MIN_TOKENS', '4096'))
+# 使い回すために手元に置いておくコンテキストの数
+CONTEXT_CACHE_MAX_ENTRIES = int(os.environ.get('TUBEHACKER_CONTEXT_CACHE_MAX_ENTRIES', '64'))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LocalCachedContent:
+    """CachedContentのオフライン代替（内容を保持し、参照回数と節約トークン数を数える）"""
+
+    _lock = threading.Lock()
+    _store = {}  # name -> インスタンス
+
+    def __init__(self, text: str, ttl: float):
+        self.name = f"local/{_digest(text)[:16]}"
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.expire_at = time.time() + ttl
+        self.uses = 0
+        with self._lock:
+            self._store[self.name] = self
+
+    def update(self, ttl: float):
+        self.expire_at = time.time() + ttl
+
+    def delete(self):
+        with self._lock:
+            self._store.pop(self.name, None)
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            entries = list(cls._store.values())
+        return {
+            'entries': len(entries),
+            'uses': sum(e.uses for e in entries),
+            'cached_tokens': sum(e.uses * e.tokens for e in entries),
+        }
+
+
+class GeminiCachedContent:
+    """CachedContentの作成・延長・削除をモデルと同じAPIキーのクライアントで行う
+
+    SDKの caching.CachedContent は常にプロセス全体の既定クライアントを使うため、代わりに使う。
+    GenerativeModel.from_cached_content には name と model があれば渡せる。
+    """
+
+    def __init__(self, clients: GeminiClients, proto):
+        self._clients = clients
+        self._proto = proto
+
+    @property
+    def name(self) -> str:
+        return self._proto.name
+
+    @property
+    def model(self) -> str:
+        return self._proto.model
+
+    @classmethod
+    def create(cls, clients: GeminiClients, text: str, ttl: float) -> 'GeminiCachedContent':
+        from google.generativeai import protos
+        cached = protos.CachedContent(
+            model=CONTEXT_CACHE_MODEL,
+            display_name='tubehacker-patterns',
+            contents=[protos.Content(role='user', parts=[protos.Part(text=text)])],
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        return cls(clients, clients.cache.create_cached_content(protos.CreateCachedContentRequest(cached_content=cached)))
+
+    def update(self, ttl: datetime.timedelta):
+        from google.generativeai import protos
+        from google.protobuf import field_mask_pb2
+        request = protos.UpdateCachedContentRequest(
+            cached_content=protos.CachedContent(name=self.name, ttl=ttl),
+            update_mask=field_mask_pb2.FieldMask(paths=['ttl']),
+        )
+        self._proto = self._clients.cache.update_cached_content(request)
+
+    def delete(self):
+        from google.generativeai import protos
+        self._clients.cache.delete_cached_content(protos.DeleteCachedContentRequest(name=self.name))
+
+
+class ContextModel:
+    """キャッシュ済みのテキストを前提にしたモデル（generate_content / count_tokens を委譲）"""
+
+    def __init__(self, base_model, text: str, backend: str, ttl: float = CONTEXT_CACHE_TTL, cached=None, cached_model=None):
+        self.base_model = base_model
+        # スケジューラ・アップロードが元のモデルと同じAPIキーを使うように
+        self.gemini_clients = clients_of(base_model)
+        self.text = text
+        self.digest = _digest(text)
+        self.backend = backend
+        self.ttl = ttl
+        self.expire_at = time.time() + ttl
+        # レスポンスキャッシュのキーがキャッシュ内容ごとに分かれるようにする
+        self.model_name = f"{getattr(base_model, 'model_name', '')}@{self.digest[:16]}"
+        self._cached = cached
+        self._cached_model = cached_model
+
+    def covers(self, text: str) -> bool:
+        """textがこのコンテキストに登録済みで、期限内か"""
+        return _digest(text) == self.digest and time.time() < self.expire_at
+
+    def _touch(self):
+        if self._cached is None or self.expire_at - time.time() > self.ttl / 2:
+            return
+        try:
+            if isinstance(self._cached, LocalCachedContent):
+                self._cached.update(self.ttl)
+            else:
+                self._cached.update(ttl=datetime.timedelta(seconds=self.ttl))
+            self.expire_at = time.time() + self.ttl
+        except Exception as e:
+            print(f"コンテキストキャッシュの延長エラー: {e}")
+
+    def _with_text(self, contents):
+        parts = list(contents) if isinstance(contents, (list, tuple)) else [contents]
+        return [self.text] + parts
+
+    def generate_content(self, contents, **kwargs):
+        self._touch()
+        if self._cached_model is not None:
+            return self._cached_model.generate_content(contents, **kwargs)
+        if isinstance(self._cached, LocalCachedContent):
+            self._cached.uses += 1
+        return self.base_model.generate_content(self._with_text(contents), **kwargs)
+
+    def count_tokens(self, contents):
+        # プロンプト部分だけの数（キャッシュ分は含めない）
+        return self.base_model.count_tokens(contents)
+
+    def delete(self):
+        """登録済みのキャッシュを削除（失敗しても期限切れで消える）"""
+        if self._cached is None:
+            return
+        try:
+            self._cached.delete()
+        except Exception as e:
+            print(f"コンテキストキャッシュの削除エラー: {e}")
+        self._cached = None
+        self._cached_model = None
+
+
+# (APIキー, モデル名, バックエンド, 内容のハッシュ) -> ContextModel
+_contexts = SharedCache(max_entries=CONTEXT_CACHE_MAX_ENTRIES, ttl=CONTEXT_CACHE_TTL)
+
+
+def create_context(model, text: str, ttl: float = CONTEXT_CACHE_TTL, backend: Optional[str] = None) -> ContextModel:
+    """textを1回だけ登録し、それを参照するモデルを返す"""
+    backend = backend or CONTEXT_CACHE_BACKEND
+    if backend == 'local':
+        return ContextModel(model, text, 'local', ttl, cached=LocalCachedContent(text, ttl))
+    if backend != 'gemini':
+        return ContextModel(model, text, 'inline', ttl)
+    tokens = estimate_tokens(text)
+    if tokens < CONTEXT_CACHE_MIN_TOKENS:
+        print(f"コンテキストキャッシュ: 約{tokens}トークンで最小の{CONTEXT_CACHE_MIN_TOKENS}トークンに満たないため、毎回送ります")
+        return ContextModel(model, text, 'inline', ttl)
+
+    clients = clients_of(model)
+    if clients is None:
+        # 既定（プロセス全体）のキーで作ると別の利用者のキーに結び付くので、キーが分からなければ使わない
+        print("コンテキストキャッシュ: モデルのAPIキーが分からないため、毎回送ります")
+        return ContextModel(model, text, 'inline', ttl)
+    try:
+        from google.generativeai import GenerativeModel
+        cached = GeminiCachedContent.create(clients, text, ttl)
+        cached_model = GenerativeModel.from_cached_content(cached)
+        cached_model._client = clients.generative
+        return ContextModel(model, text, 'gemini', ttl, cached=cached, cached_model=cached_model)
+    except Exception as e:
+        print(f"コンテキストキャッシュの作成エラー: {e}")
+        return ContextModel(model, text, 'inline', ttl)
+
+
+def get_context(model, text: str, ttl: float = CONTEXT_CACHE_TTL, backend: Optional[str] = None) -> ContextModel:
+    """create_context と同じだが、同じAPIキー・モデル・内容の期限内のものがあれば使い回す（プロセス共有）
+
+    作成は通信を伴うので、UIのスレッドではなくジョブの中で呼ぶ。同時に同じ内容を求められたら1回だけ作る。
+    使われなくなったキャッシュは削除せず、Gemini側の期限切れで消える。
+    """
+    clients = clients_of(model)
+    key = (
+        clients.api_key if clients is not None else id(model),
+        getattr(model, 'model_name', ''),
+        backend or CONTEXT_CACHE_BACKEND,
+        _digest(text),
+    )
+    context = _contexts.get(key)
+    if context is not None and context.covers(text):
+        return context
+    return _contexts.get_or_load(key, lambda: create_context(model, text, ttl, backend), refresh=True)
+
+
+def uses_context(model) -> bool:
+    """共通パターンがプロンプトの外（キャッシュ or 先頭）で渡されるモデルか"""
+    return isinstance(model, ContextModel)
@@ -0,0 +1,19 @@
+"""クリップボードへのコピーボタン
+
+static/copy_button のHTMLを1つのコンポーネントとして登録し、コピーするテキストは
+呼び出しごとの引数（データ）として渡す。テキストをエスケープしてHTMLに埋め込んだ
+iframeを毎回作らないので、再実行のたびに送るデータ量はテキスト本体だけになり、
+HTML/JSはブラウザにキャッシュされた静的ファイルが使われる。
+"""
+import os
+
+import streamlit.components.v1 as components
+
+_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'copy_button')
+
+_copy_button = components.declare_component('copy_button', path=_COMPONENT_DIR)
+
+
+def copy_button(text: str, key: str, label: str = 'コピー', done_label: str = '✓ コピー完了'):
+    """textをコピーするボタンを表示"""
+    _copy_button(text=text, label=label, done_label=done_label, key=key, default=None)
@@ -0,0 +1,1037 @@
+"""動画の取得・分析・生成の処理
+
+Streamlitに依存しない関数をまとめたモジュール。app.py（UI）と batch.py（CLI）の両方から使う。
+"""
+import re
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Callable, Iterator, Tuple
+from urllib.parse import quote
+from http_client import http_get, http_post_json
+from gemini_client import clients_of, delete_file, upload_file
+from gemini_scheduler import GEMINI_MAX_CONCURRENCY, generate_content
+from video_cache import get_video_cache
+from thumbnails import fetch_thumbnail, image_size, thumbnail_part
+from response_cache import generate_text, stream_text
+from prompt_budget import (
+    IDEAS_PATTERNS_TOKENS, PATTERNS_INPUT_TOKENS, SCRIPT_PATTERNS_TOKENS, SHORTS_TRANSCRIPT_TOKENS, TRANSCRIPT_TOKENS,
+    estimate_tokens, fit_to_budget,
+)
+from context_cache import get_context, uses_context
+from models import VideoResult
+from shared_cache import get_shared_cache
+from yt_parser import extract_yt_initial_data, extract_innertube_config, extract_watch_title, find_continuation_token, iter_videos
+
+MAX_VIDEOS = 5
+# ページ送りでチャンネル動画を取得する場合の既定上限
+MAX_CHANNEL_VIDEOS = 500
+# パイプライン各段の同時実行数（動画情報・字幕取得 / Gemini分析）
+FETCH_WORKERS = int(os.environ.get('TUBEHACKER_FETCH_WORKERS', '6'))
+GEMINI_WORKERS = int(os.environ.get('TUBEHACKER_GEMINI_WORKERS', '3'))
+
+# yt-dlpの拡張子 -> Geminiに渡すMIMEタイプ（再エンコードせずそのまま送る）
+AUDIO_MIME_TYPES = {
+    'm4a': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'webm': 'audio/webm',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+}
+# これ以下ならアップロードせずリクエストに直接埋め込む（上限は1リクエスト20MB）
+INLINE_AUDIO_MAX_BYTES = 15 * 1024 * 1024
+# 分析結果の合計がPATTERNS_INPUT_TOKENSを超えたら、グループごとに要約してから共通パターンを抽出する
+# 要約1回に渡す分析結果の合計トークン数と、要約1件あたりの文字数
+PATTERN_GROUP_MAX_TOKENS = 12000
+PATTERN_SUMMARY_CHARS = 1500
+# 要約を重ねる最大回数
+PATTERN_MAX_LEVELS = 3
+# コンテキストキャッシュ利用時にプロンプトへ入れる参照
+PATTERNS_IN_CONTEXT = "（冒頭の【黄金パターン】を参照）"
+# コンテキストキャッシュに登録する共通パターンの予算。キャッシュ済みのトークンは割安なので、
+# 企画案・台本とも大きい方の予算で登録した1つを参照する（Geminiの最小トークン数も超えやすい）
+PATTERNS_CONTEXT_TOKENS = max(IDEAS_PATTERNS_TOKENS, SCRIPT_PATTERNS_TOKENS)
+# この文字数以上の台本はセクションごとに並列生成するのを既定にする
+SECTIONED_SCRIPT_MIN_CHARS = 8000
+# 台本のセクション: (見出し, 内容の指示, 目標文字数の割合の分母)
+SCRIPT_SECTIONS = [
+    ('フック', '視聴者の好奇心を刺激する冒頭。問題提起や意外な事実を複数の文で詳しく説明', 8),
+    ('CTA①', 'チャンネル登録を自然に呼びかけ。なぜ登録すべきか理由も添えて', 20),
+    ('導入', '今日の動画で得られるメリットを具体的に3つ以上説明', 8),
+    ('本題1', 'メインコンテンツ1。具体例を3つ以上挙げながら詳しく解説。視聴者の疑問を先回りして答える', 5),
+    ('本題2', 'メインコンテンツ2。具体例を3つ以上挙げながら詳しく解説。ステップバイステップで説明', 5),
+    ('CTA②', '途中のエンゲージメント。コメントやいいねを促す。質問を投げかける', 20),
+    ('本題3', 'メインコンテンツ3。具体例を3つ以上挙げながら詳しく解説。実践的なアドバイス', 5),
+    ('注意点', 'よくある失敗や間違いを3つ以上挙げて、それぞれの対処法も説明', 10),
+    ('まとめ', '今日のポイントを箇条書きではなく文章で振り返り。実践を促す', 10),
+    ('CTA③', '最後のチャンネル登録・高評価の呼びかけ', 30),
+    ('エンディング', '次の動画への期待を持たせる締めくくり', 30),
+]
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    patterns = [
+        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([a-zA-Z0-9_-]{11})',
+        r'youtube\.com\/shorts\/([a-zA-Z0-9_-]{11})',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _channel_videos_url(channel_url: str) -> str:
+    # URLを正規化（/videosを追加）
+    base_url = channel_url.rstrip('/')
+    if not base_url.endswith('/videos'):
+        return base_url + '/videos'
+    return base_url
+
+
+def _fetch_channel_page(channel_url: str) -> Tuple[Optional[dict], dict]:
+    """チャンネルの動画タブを取得し (ytInitialData, innertube設定) を返す"""
+    # User-Agent / Accept-Language は共有Sessionの既定ヘッダーを使用
+    headers = {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    }
+    response = http_get(_channel_videos_url(channel_url), headers=headers, timeout=20)
+    # ytInitialDataを抽出（bytesのまま代入位置からJSONを1つだけデコード）
+    return extract_yt_initial_data(response.content), extract_innertube_config(response.content)
+
+
+def _fetch_browse_continuation(config: dict, token: str) -> dict:
+    """browse APIで続きのページを取得"""
+    payload = {
+        'context': {'client': {
+            'clientName': 'WEB',
+            'clientVersion': config.get('client_version', '2.20240101.00.00'),
+            'hl': 'ja',
+            'gl': 'JP',
+        }},
+        'continuation': token,
+    }
+    url = f"https://www.youtube.com/youtubei/v1/browse?key={config.get('api_key', '')}&prettyPrint=false"
+    response = http_post_json(url, payload, timeout=20)
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_channel_videos(channel_url: str, limit: int = MAX_CHANNEL_VIDEOS) -> Iterator[dict]:
+    """チャンネルの動画を新しい順に最大limit件まで返すジェネレータ
+
+    ytInitialData の continuation トークンをたどって browse API でページ送りする。
+    次のページはトークンが分かった時点で裏で取得を始め、呼び出し側が今のページを消費している間に届く。
+    """
+    data, config = _fetch_channel_page(channel_url)
+    if not data:
+        return
+
+    seen = set()
+    count = 0
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='browse')
+    try:
+        while data is not None:
+            token = find_continuation_token(data) if config.get('api_key') else None
+            # 次ページを先読み
+            next_page = pool.submit(_fetch_browse_continuation, config, token) if token else None
+
+            for video in iter_videos(data, limit - count, match_bare=True, seen=seen):
+                yield video
+                count += 1
+            if count >= limit or next_page is None:
+                return
+
+            try:
+                data = next_page.result()
+            except Exception as e:
+                print(f"チャンネル動画ページ送りエラー: {e}")
+                return
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_videos_from_channel(channel_url: str, max_videos: int = MAX_VIDEOS, paginate: bool = False) -> List[dict]:
+    try:
+        if paginate:
+            return list(iter_channel_videos(channel_url, limit=max_videos))
+        
+        data, _ = _fetch_channel_page(channel_url)
+        if not data:
+            return []
+        
+        # videoRenderer / gridVideoRenderer / richItemRenderer / reelItemRenderer と直接videoIdを持つ要素を拾う
+        return list(iter_videos(data, max_videos, match_bare=True))
+    except Exception as e:
+        print(f"チャンネル動画取得エラー: {e}")
+        return []
+
+
+def search_youtube_videos(query: str, max_videos: int = MAX_VIDEOS) -> List[dict]:
+    try:
+        search_url = f"https://www.youtube.com/results?search_query={quote(query)}"
+        response = http_get(search_url, timeout=15)
+        
+        data = extract_yt_initial_data(response.content)
+        if not data:
+            return []
+        
+        return list(iter_videos(data, max_videos, renderer_keys=('videoRenderer',)))
+    except Exception:
+        return []
+
+
+def get_video_info(video_id: str, is_shorts: bool = False) -> dict:
+    try:
+        # ショートの場合は両方のURLを試す
+        if is_shorts:
+            url = f"https://www.youtube.com/shorts/{video_id}"
+        else:
+            url = f"https://www.youtube.com/watch?v={video_id}"
+        
+        # キャッシュにあればネットワークアクセスなしで返す
+        cache = get_video_cache()
+        cached = cache.get(video_id)
+        if cached:
+            thumbnail_bytes = cached['thumbnail_bytes']
+            return {
+                'title': cached['title'], 
+                'thumbnail_url': cached['thumbnail_url'], 
+                'thumbnail_bytes': thumbnail_bytes, 
+                'thumbnail_size': image_size(thumbnail_bytes) if thumbnail_bytes else None, 
+                'video_id': video_id, 
+                'url': url,
+                'is_shorts': is_shorts
+            }
+        
+        # タイトル取得: <head> の og:title / <title> が見つかった時点で読み込みを打ち切る
+        with http_get(url, timeout=15, stream=True) as response:
+            title, _ = extract_watch_title(response.iter_content(chunk_size=16384))
+        
+        if not title:
+            title = "タイトル取得失敗"
+        
+        # サムネイル取得（maxres / hq を同時に取得し、縮小済みJPEGのバイト列で保持）
+        thumbnail = fetch_thumbnail(video_id)
+        thumbnail_url = thumbnail['url'] if thumbnail else None
+        thumbnail_bytes = thumbnail['data'] if thumbnail else None
+        
+        if title != "タイトル取得失敗":
+            cache.put(video_id, title, thumbnail_url, thumbnail_bytes)
+        
+        return {
+            'title': title, 
+            'thumbnail_url': thumbnail_url, 
+            'thumbnail_bytes': thumbnail_bytes, 
+            'thumbnail_size': (thumbnail['width'], thumbnail['height']) if thumbnail else None, 
+            'video_id': video_id, 
+            'url': url,
+            'is_shorts': is_shorts
+        }
+    except Exception as e:
+        return {
+            'title': "取得エラー", 
+            'thumbnail_url': None, 
+            'thumbnail_bytes': None, 
+            'thumbnail_size': None, 
+            'video_id': video_id, 
+            'url': f"https://www.youtube.com/watch?v={video_id}", 
+            'error': str(e),
+            'is_shorts': is_shorts
+        }
+
+
+def get_transcript(video_id: str) -> Optional[str]:
+    try:
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        ytt_api = YouTubeTranscriptApi()
+        
+        # 方法1: 日本語・英語の字幕を直接試す
+        for lang in ['ja', 'en', 'ja-JP', 'en-US']:
+            try:
+                transcript_data = ytt_api.fetch(video_id, languages=[lang])
+                full_text = ' '.join([entry.text for entry in transcript_data])
+                if full_text.strip():
+                    return full_text
+            except Exception:
+                pass
+        
+        # 方法2: 利用可能な字幕一覧から取得
+        try:
+            transcript_list = ytt_api.list(video_id)
+            
+            # まず手動字幕を優先
+            for transcript in transcript_list:
+                if not transcript.is_generated:
+                    try:
+                        transcript_data = transcript.fetch()
+                        full_text = ' '.join([entry.text for entry in transcript_data])
+                        if full_text.strip():
+                            return full_text
+                    except Exception:
+                        pass
+            
+            # 次に自動生成字幕を試す
+            for transcript in transcript_list:
+                if transcript.is_generated:
+                    try:
+                        transcript_data = transcript.fetch()
+                        full_text = ' '.join([entry.text for entry in transcript_data])
+                        if full_text.strip():
+                            return full_text
+                    except Exception:
+                        pass
+                        
+        except Exception:
+            pass
+        
+        return None
+    except Exception:
+        return None
+
+
+def _download_shorts_audio(video_id: str) -> Tuple[tempfile.SpooledTemporaryFile, str]:
+    """ショート動画の音声をそのままのコンテナでメモリ（大きければ一時ファイル）に読み込む"""
+    import yt_dlp
+    
+    ydl_opts = {
+        'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio',
+        'quiet': True,
+        'no_warnings': True,
+    }
+    url = f"https://www.youtube.com/shorts/{video_id}"
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    
+    mime_type = AUDIO_MIME_TYPES.get(info.get('ext', ''), 'audio/mp4')
+    buffer = tempfile.SpooledTemporaryFile(max_size=INLINE_AUDIO_MAX_BYTES)
+    try:
+        with http_get(info['url'], headers=info.get('http_headers', {}), timeout=30, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=65536):
+                buffer.write(chunk)
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer, mime_type
+
+
+def transcribe_shorts_audio(model, video_id: str) -> Optional[str]:
+    """ショート動画の音声をダウンロードしてGeminiで文字起こし（結果はvideo_idごとにキャッシュ）"""
+    cache = get_video_cache()
+    cached = cache.get_transcript(video_id)
+    if cached:
+        return cached
+    
+    try:
+        buffer, mime_type = _download_shorts_audio(video_id)
+        
+        prompt = """この音声を日本語で文字起こししてください。
+話されている内容をそのまま書き起こしてください。
+前置きや説明は不要です。音声の内容のみ出力してください。"""
+        
+        with buffer:
+            size = buffer.seek(0, os.SEEK_END)
+            buffer.seek(0)
+            if size <= INLINE_AUDIO_MAX_BYTES:
+                # 小さい音声はアップロードせずリクエストに埋め込む
+                response = generate_content(model, [prompt, {'mime_type': mime_type, 'data': buffer.read()}])
+            else:
+                clients = clients_of(model)
+                if clients is None:
+                    print("音声文字起こしエラー: このモデルではファイルをアップロードできません")
+                    return None
+                audio_data = upload_file(clients, buffer, mime_type)
+                try:
+                    response = generate_content(model, [prompt, audio_data])
+                finally:
+                    delete_file(clients, audio_data)
+        
+        transcript = response.text.strip()
+        if transcript:
+            cache.put_transcript(video_id, transcript)
+        return transcript
+            
+    except Exception as e:
+        print(f"音声文字起こしエラー: {e}")
+        return None
+
+def analyze_video_with_gemini(model, video_info: dict, transcript: str, use_cache: bool = True) -> VideoResult:
+    transcript_text = transcript if transcript and len(transcript.strip()) > 50 else None
+    char_count = len(transcript) if transcript else 0
+    
+    # ショート動画かどうかを判定（URLにshortsが含まれるか、字幕が短い）
+    is_shorts = 'shorts' in video_info.get('url', '') or (char_count > 0 and char_count < 500)
+    
+    if is_shorts:
+        # ショート動画用プロンプト
+        prompt = f"""YouTubeショート動画を分析してください。前置きは不要。直接内容のみ出力。
+
+【タイトル】{video_info['title']}
+【字幕テキスト】{fit_to_budget(transcript_text, SHORTS_TRANSCRIPT_TOKENS, model) if transcript_text else "なし（字幕なし）"}
+
+以下の形式で出力：
+
+## 文字起こし（{char_count}文字）
+{f"字幕テキストをそのまま整形して出力してください。誤字脱字のみ修正し、要約や省略はしない。適切な箇所で改行を入れて読みやすく整形。" if transcript_text else "字幕テキストがないため、文字起こしはできません。"}
+
+## タイトル分析
+- キーワード: 
+- 文字数: {len(video_info['title'])}文字
+- 煽り要素: 
+- クリック誘発テクニック: 
+
+## サムネイル/最初のフレーム分析
+※添付画像を分析
+- インパクト: 
+- テキスト: 
+- 配置: 
+- 色使い: 
+
+## CTA分析
+- CTA/誘導の有無: 
+- 誘導先: 
+
+## 構成分析（縦型ショート特有）
+- 冒頭のつかみ（フック）: 
+- 展開速度: 
+- 視聴維持の工夫: 
+- バズ要素: 
+- ターゲット層: 
+"""
+    else:
+        # 通常動画用プロンプト
+        prompt = f"""YouTube動画を分析してください。前置きや挨拶は一切不要。直接内容のみ出力。
+
+【タイトル】{video_info['title']}
+【字幕テキスト】{fit_to_budget(transcript_text, TRANSCRIPT_TOKENS, model) if transcript_text else "なし"}
+
+以下の形式で出力：
+
+## 文字起こし（{char_count}文字）
+字幕テキストの誤字脱字のみ修正。要約や省略はしない。内容はそのまま維持。
+適切な箇所で見出しをつけて読みやすく整形。
+
+## タイトル分析
+- キーワード: SEOとして有効な複合キーワードのみ（単語の羅列ではなく、検索されそうなフレーズ）
+- 文字数: {len(video_info['title'])}文字
+- 煽り要素: 
+- クリック誘発テクニック: 
+
+## サムネイル分析
+※添付画像を分析
+- 文字の配置: 
+- フォント: 
+- 色使い: 
+- 背景: 
+- 人物: 
+- 視線誘導: 
+- サムネイル内の文字数: 〇文字
+
+## CTA分析
+冒頭・途中・終盤すべてのCTAを検出：
+- 冒頭CTA: タイミング、訴求内容、セリフ
+- 途中CTA: タイミング、訴求内容、セリフ（複数あれば全て）
+- 終盤CTA: タイミング、訴求内容、セリフ
+
+## 構成分析
+- 冒頭フック: 
+- 視聴維持の工夫: 
+- 訴求内容: 
+- ターゲット層: 
+"""
+    
+    # レート制限時のリトライはスケジューラがキュー上で行う
+    try:
+        image = thumbnail_part(video_info)
+        if image:
+            analysis = generate_text(model, [prompt, image], use_cache=use_cache)
+        else:
+            analysis = generate_text(model, prompt, use_cache=use_cache)
+        
+        return VideoResult.from_video_info(
+            video_info,
+            success=True,
+            analysis=analysis,
+            has_transcript=transcript_text is not None,
+            transcript=transcript,
+            char_count=char_count,
+            is_shorts=is_shorts,
+        )
+    except Exception as e:
+        return VideoResult.from_video_info(video_info, success=False, error=str(e), is_shorts=is_shorts)
+
+def _pattern_stats(all_results: list) -> dict:
+    """文字起こし・タイトルの文字数統計"""
+    char_counts = [r.char_count for r in all_results if r.char_count > 0]
+    title_lengths = [len(r.title) for r in all_results if r.success]
+    return {
+        'avg': sum(char_counts) // len(char_counts) if char_counts else 0,
+        'max': max(char_counts) if char_counts else 0,
+        'min': min(char_counts) if char_counts else 0,
+        'avg_title': sum(title_lengths) // len(title_lengths) if title_lengths else 0,
+        'max_title': max(title_lengths) if title_lengths else 0,
+        'min_title': min(title_lengths) if title_lengths else 0,
+    }
+
+
+def _analysis_blocks(all_results: list) -> List[str]:
+    """動画ごとの分析結果を見出しつきのブロックにする"""
+    blocks = []
+    for i, result in enumerate(all_results, 1):
+        if result.success:
+            title = result.title
+            blocks.append(
+                f"---【動画{i}: {title}（タイトル{len(title)}文字, 文字起こし{result.char_count}文字）】---\n"
+                f"{result.analysis}"
+            )
+    return blocks
+
+
+def _group_blocks(blocks: List[str], max_tokens: int = PATTERN_GROUP_MAX_TOKENS) -> List[List[str]]:
+    """合計がmax_tokens以内になるよう、順番を保ってブロックをまとめる"""
+    groups = []
+    current = []
+    size = 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(block)
+        size += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _build_condense_prompt(group: List[str]) -> str:
+    joined = '\n\n'.join(group)
+    return f"""以下は複数のYouTube動画の分析結果です。後で全体の共通パターンを抽出するための中間要約を作成。
+前置きや挨拶は一切不要。直接内容のみ出力。
+
+{joined}
+
+★ 出力ルール:
+- {PATTERN_SUMMARY_CHARS}文字以内
+- タイトル・サムネイル・台本構成・CTA配置・テクニックの観点で、複数の動画に共通する特徴を優先
+- 特徴的な具体例（タイトルの言い回し、フックの手法など）は動画番号を添えて残す
+- 文字数など数値の情報は省略しない
+"""
+
+
+def _condense_analyses(model, blocks: List[str], use_cache: bool = True, max_workers: int = GEMINI_WORKERS) -> List[str]:
+    """分析結果をグループごとに並列で要約し、直接渡せる量になるまで繰り返す（map段）"""
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='pattern-map')
+    try:
+        for _ in range(PATTERN_MAX_LEVELS):
+            if sum(estimate_tokens(block) for block in blocks) <= PATTERNS_INPUT_TOKENS:
+                break
+            groups = _group_blocks(blocks)
+            futures = [pool.submit(generate_text, model, _build_condense_prompt(group), use_cache) for group in groups]
+            blocks = [
+                f"---【要約{n}（{len(group)}件分）】---\n{future.result().strip()}"
+                for n, (group, future) in enumerate(zip(groups, futures), 1)
+            ]
+        return blocks
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _build_patterns_prompt(combined: str, is_single: bool, stats: dict) -> str:
+    prompt = f"""YouTube動画の分析結果から{'構成パターン' if is_single else '共通の黄金パターン'}を抽出。
+前置きや挨拶は一切不要。直接内容のみ出力。
+
+{combined}
+
+以下の形式で出力：
+
+## タイトルの{'特徴' if is_single else '黄金パターン'}
+- キーワード傾向
+- 構成パターン
+- 効果的な要素
+- タイトル文字数の傾向: 平均{stats['avg_title']}文字（{stats['min_title']}〜{stats['max_title']}文字）
+
+## サムネイルの{'特徴' if is_single else '黄金パターン'}
+- 色使い
+- 文字の配置
+- 視線誘導
+- サムネイル文字数の傾向: 〇〜〇文字
+
+## 台本構成の{'詳細分析' if is_single else '黄金パターン'}
+
+### 文字起こしの文字数
+- 平均: {stats['avg']}文字
+- 最大: {stats['max']}文字
+- 最小: {stats['min']}文字
+- **台本生成時の目標文字数: {stats['avg']}文字前後**
+
+### 全体構成
+1. フック
+2. CTA①
+3. 導入
+4. 本題1
+5. 本題2
+6. CTA②
+7. 本題3
+8. 注意点
+9. まとめ
+10. CTA③
+
+### CTA配置パターン
+- 冒頭CTA: 
+- 途中CTA: 
+- 終盤CTA: 
+
+### 各パートのテクニック
+
+## チェックリスト
+"""
+    return prompt
+
+
+def _prepare_patterns_prompt(model, all_results: list, use_cache: bool) -> str:
+    """最終（reduce）段のプロンプトを作る。分析結果が多い場合は先に要約してから渡す"""
+    blocks = _condense_analyses(model, _analysis_blocks(all_results), use_cache)
+    combined = fit_to_budget('\n\n'.join(blocks), PATTERNS_INPUT_TOKENS, model, compress=False)
+    return _build_patterns_prompt(combined, len(all_results) == 1, _pattern_stats(all_results))
+
+
+def _char_stats(stats: dict) -> dict:
+    return {'avg': stats['avg'], 'max': stats['max'], 'min': stats['min']}
+
+
+def _stream_or_error(model, prompt: str, use_cache: bool) -> Iterator[str]:
+    try:
+        yield from stream_text(model, prompt, use_cache=use_cache)
+    except Exception as e:
+        yield f"エラー: {str(e)}"
+
+
+def extract_common_patterns(model, all_results: list, use_cache: bool = True) -> tuple:
+    try:
+        prompt = _prepare_patterns_prompt(model, all_results, use_cache)
+        patterns = generate_text(model, prompt, use_cache=use_cache)
+        return patterns, _char_stats(_pattern_stats(all_results))
+    except Exception as e:
+        return f"エラー: {str(e)}", {'avg': 0, 'max': 0, 'min': 0}
+
+
+def _stream_patterns(model, all_results: list, use_cache: bool) -> Iterator[str]:
+    try:
+        prompt = _prepare_patterns_prompt(model, all_results, use_cache)
+    except Exception as e:
+        yield f"エラー: {str(e)}"
+        return
+    yield from _stream_or_error(model, prompt, use_cache)
+
+
+def stream_common_patterns(model, all_results: list, use_cache: bool = True) -> Tuple[Iterator[str], dict]:
+    """extract_common_patterns のストリーミング版。(チャンクのイテレータ, 文字数統計) を返す
+
+    要約（map段）はイテレータを最初に進めた時点で実行される。
+    """
+    return _stream_patterns(model, all_results, use_cache), _char_stats(_pattern_stats(all_results))
+
+
+
+def patterns_context_text(common_patterns: str) -> str:
+    """コンテキストキャッシュに登録する共通パターン"""
+    return f"【黄金パターン】\n{fit_to_budget(common_patterns, PATTERNS_CONTEXT_TOKENS, compress=False)}"
+
+
+def patterns_model(model, common_patterns: str):
+    """共通パターンをキャッシュに登録済みのモデル（キャッシュできなければ元のモデル）
+
+    登録は通信を伴うので、ジョブの中で呼ぶ。同じパターンなら企画案・台本・他のセッションで使い回す。
+    """
+    context = get_context(model, patterns_context_text(common_patterns))
+    # 毎回先頭に付けて送るだけなら、呼び出しごとの予算でプロンプトに入れる方が短い
+    return model if context.backend == 'inline' else context
+
+
+def _patterns_text(model, common_patterns: str, budget: int) -> str:
+    """プロンプトに埋め込む共通パターン（登録済みのコンテキストなら参照のみ）"""
+    if uses_context(model) and model.covers(patterns_context_text(common_patterns)):
+        return PATTERNS_IN_CONTEXT
+    return fit_to_budget(common_patterns, budget, compress=False)
+
+
+def _build_ideas_prompt(model, common_patterns: str, theme: str, video_titles: list) -> str:
+    theme_text = theme if theme else f"分析した動画（{', '.join(video_titles[:3])}）の内容に基づいてAIが最適なテーマを提案"
+    
+    prompt = f"""YouTubeコンテンツの企画案を生成。前置きや挨拶は一切不要。直接内容のみ出力。
+
+【黄金パターン】
+{_patterns_text(model, common_patterns, IDEAS_PATTERNS_TOKENS)}
+
+【テーマ】
+{theme_text}
+
+以下の形式で3つの企画案を出力：
+
+## 企画案1
+### タイトル案
+1. [具体的なタイトル]
+2. [具体的なタイトル]
+3. [具体的なタイトル]
+
+### サムネイル構成案
+- メインテキスト: [具体的な文言]
+- サブテキスト: 
+- 背景: 
+- 配置: 
+
+### 台本構成案
+
+---
+
+## 企画案2
+（同様）
+
+---
+
+## 企画案3
+（同様）
+"""
+    return prompt
+
+
+def generate_content_ideas(model, common_patterns: str, theme: str, video_titles: list, use_cache: bool = True) -> str:
+    prompt = _build_ideas_prompt(model, common_patterns, theme, video_titles)
+    try:
+        return generate_text(model, prompt, use_cache=use_cache)
+    except Exception as e:
+        return f"エラー: {str(e)}"
+
+
+def stream_content_ideas(model, common_patterns: str, theme: str, video_titles: list, use_cache: bool = True) -> Iterator[str]:
+    """generate_content_ideas のストリーミング版"""
+    return _stream_or_error(model, _build_ideas_prompt(model, common_patterns, theme, video_titles), use_cache)
+
+
+def parse_ideas(ideas_text: str) -> dict:
+    """企画案からタイトルとサムネワードを抽出"""
+    parsed = {}
+    
+    for plan_num in [1, 2, 3]:
+        parsed[plan_num] = {'titles': [], 'thumbnail_word': ''}
+        
+        # タイトル抽出
+        pattern = rf'企画案{plan_num}.*?タイトル案.*?1\.\s*(.+?)(?:\n|$).*?2\.\s*(.+?)(?:\n|$).*?3\.\s*(.+?)(?:\n|$)'
+        match = re.search(pattern, ideas_text, re.DOTALL)
+        if match:
+            parsed[plan_num]['titles'] = [match.group(1).strip(), match.group(2).strip(), match.group(3).strip()]
+        
+        # サムネイルワード抽出
+        thumb_pattern = rf'企画案{plan_num}.*?メインテキスト[：:]\s*(.+?)(?:\n|$)'
+        thumb_match = re.search(thumb_pattern, ideas_text, re.DOTALL)
+        if thumb_match:
+            parsed[plan_num]['thumbnail_word'] = thumb_match.group(1).strip().strip('[]「」')
+    
+    return parsed
+
+
+def _build_script_prompt(model, common_patterns: str, theme: str, title: str, thumbnail_word: str, target_chars: int) -> str:
+    # 文字数の配分を計算（より詳細に）
+    if target_chars > 0:
+        char_instruction = f"""
+★★★ 最重要 ★★★
+この台本の総文字数は【必ず{target_chars}文字以上】にしてください。
+短い台本は絶対にNGです。各セクションを十分に詳しく書いてください。
+
+目標文字数の内訳:
+- フック（冒頭のつかみ）: {target_chars // 8}文字以上
+- CTA①: {target_chars // 20}文字以上
+- 導入: {target_chars // 8}文字以上
+- 本題1: {target_chars // 5}文字以上（具体例3つ以上必須）
+- 本題2: {target_chars // 5}文字以上（具体例3つ以上必須）
+- CTA②: {target_chars // 20}文字以上
+- 本題3: {target_chars // 5}文字以上（具体例3つ以上必須）
+- 注意点: {target_chars // 10}文字以上
+- まとめ: {target_chars // 10}文字以上
+- CTA③・エンディング: {target_chars // 15}文字以上
+
+合計で必ず{target_chars}文字以上になるように、各セクションを詳しく書いてください。
+"""
+    else:
+        char_instruction = """
+この台本は5000文字以上で詳しく書いてください。
+各セクションには具体例を3つ以上含めてください。
+"""
+    
+    prompt = f"""YouTube動画の台本を生成してください。
+
+{char_instruction}
+
+【参考パターン】
+{_patterns_text(model, common_patterns, SCRIPT_PATTERNS_TOKENS)}
+
+【テーマ】{theme}
+【タイトル】{title}
+{'【サムネイルワード】' + thumbnail_word if thumbnail_word else ''}
+
+★ 出力ルール:
+- 「ナレーション」「セリフ」などのラベル不要。直接話し言葉で開始
+- 演出メモや（カッコ書きの指示）は出力しない
+- 見出しはH2（##）とH3（###）のみ
+- 区切り線（---）は不要
+- 視聴者に語りかける口調で親しみやすく
+- 各セクションは複数の段落で構成し、具体例やエピソードを豊富に入れる
+- 短い文章はNG。各セクションをしっかりと詳しく書く
+
+## フック
+（視聴者の好奇心を刺激する冒頭。問題提起や意外な事実を複数の文で詳しく説明）
+
+## CTA①
+（チャンネル登録を自然に呼びかけ。なぜ登録すべきか理由も添えて）
+
+## 導入
+（今日の動画で得られるメリットを具体的に3つ以上説明）
+
+## 本題1
+（メインコンテンツ1。具体例を3つ以上挙げながら詳しく解説。視聴者の疑問を先回りして答える）
+
+## 本題2
+（メインコンテンツ2。具体例を3つ以上挙げながら詳しく解説。ステップバイステップで説明）
+
+## CTA②
+（途中のエンゲージメント。コメントやいいねを促す。質問を投げかける）
+
+## 本題3
+（メインコンテンツ3。具体例を3つ以上挙げながら詳しく解説。実践的なアドバイス）
+
+## 注意点
+（よくある失敗や間違いを3つ以上挙げて、それぞれの対処法も説明）
+
+## まとめ
+（今日のポイントを箇条書きではなく文章で振り返り。実践を促す）
+
+## CTA③
+
+## エンディング
+（次の動画への期待を持たせる締めくくり）
+
+★ 再確認: 必ず{target_chars if target_chars > 0 else 5000}文字以上で出力してください。短い台本はNGです。
+"""
+    return prompt
+
+
+def stream_full_script(model, common_patterns: str, theme: str, title: str, thumbnail_word: str, target_chars: int = 0, use_cache: bool = True) -> Iterator[str]:
+    """generate_full_script のストリーミング版"""
+    prompt = _build_script_prompt(model, common_patterns, theme, title, thumbnail_word, target_chars)
+    return _stream_or_error(model, prompt, use_cache)
+
+
+def generate_full_script(model, common_patterns: str, theme: str, title: str, thumbnail_word: str, target_chars: int = 0, use_cache: bool = True) -> tuple:
+    prompt = _build_script_prompt(model, common_patterns, theme, title, thumbnail_word, target_chars)
+    try:
+        script_text = generate_text(model, prompt, use_cache=use_cache)
+        char_count = len(script_text)
+        return script_text, char_count
+    except Exception as e:
+        return f"エラー: {str(e)}", 0
+
+
+def _build_outline_prompt(model, common_patterns: str, theme: str, title: str, thumbnail_word: str) -> str:
+    headings = '\n'.join(f"## {name}\n- " for name, _, _ in SCRIPT_SECTIONS)
+    return f"""YouTube動画の台本の骨子を作成してください。前置きや挨拶は一切不要。直接内容のみ出力。
+
+【参考パターン】
+{_patterns_text(model, common_patterns, SCRIPT_PATTERNS_TOKENS)}
+
+【テーマ】{theme}
+【タイトル】{title}
+{'【サムネイルワード】' + thumbnail_word if thumbnail_word else ''}
+
+各セクションで話す要点・具体例・エピソードを2〜4個の箇条書きで。本文は書かない。
+セクション間で内容が重複しないように割り振る。
+
+{headings}
+"""
+
+
+def _build_section_prompt(outline: str, theme: str, title: str, name: str, instruction: str, section_chars: int) -> str:
+    return f"""YouTube動画の台本のうち「{name}」セクションの本文だけを書いてください。
+
+【テーマ】{theme}
+【タイトル】{title}
+
+【台本全体の骨子】
+{outline}
+
+【このセクション】{name}
+（{instruction}）
+★ このセクションだけで必ず{section_chars}文字以上。骨子の「{name}」の要点をすべて盛り込む。
+
+★ 出力ルール:
+- 見出しは出力しない（「## {name}」は付けない）。本文のみ
+- 「ナレーション」「セリフ」などのラベル不要。直接話し言葉で
+- 演出メモや（カッコ書きの指示）は出力しない
+- 他のセクションの内容には触れない。前後のセクションと自然につながる書き出し・締めにする
+- 視聴者に語りかける口調で親しみやすく、複数の段落で構成
+"""
+
+
+def stream_sectioned_script(
+    model,
+    common_patterns: str,
+    theme: str,
+    title: str,
+    thumbnail_word: str,
+    target_chars: int = 0,
+    use_cache: bool = True,
+    max_workers: int = min(len(SCRIPT_SECTIONS), GEMINI_MAX_CONCURRENCY),
+) -> Iterator[str]:
+    """骨子を1回生成した後、各セクションを並列に生成し、完成した順ではなく台本の順に返す
+
+    セクションの呼び出しもGeminiスケジューラを通るため、同時に送られるのは
+    GEMINI_MAX_CONCURRENCY 件まで（他のセッションの呼び出しと共有）。所要時間はおおよそ
+    骨子1回 + ceil(セクション数 / 同時実行数) 回分で、既定（11セクション・4並列）では骨子 + 3回分になる。
+    """
+    total_chars = target_chars if target_chars > 0 else 5000
+    try:
+        outline = generate_text(model, _build_outline_prompt(model, common_patterns, theme, title, thumbnail_word), use_cache=use_cache)
+    except Exception as e:
+        yield f"エラー: {str(e)}"
+        return
+
+    # セクションのプロンプトは骨子だけを使うので、共通パターンを登録したモデルは使わない
+    section_model = getattr(model, 'base_model', model)
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='script-section')
+    try:
+        futures = [
+            pool.submit(
+                generate_text,
+                section_model,
+                _build_section_prompt(outline, theme, title, name, instruction, total_chars // divisor),
+                use_cache,
+            )
+            for name, instruction, divisor in SCRIPT_SECTIONS
+        ]
+        for (name, _, _), future in zip(SCRIPT_SECTIONS, futures):
+            try:
+                body = future.result().strip()
+            except Exception as e:
+                body = f"エラー: {str(e)}"
+            yield f"## {name}\n\n{body}\n\n"
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_full_script_sectioned(model, common_patterns: str, theme: str, title: str, thumbnail_word: str, target_chars: int = 0, use_cache: bool = True) -> tuple:
+    """stream_sectioned_script の結果をまとめて返す（generate_full_script と同じ戻り値）"""
+    script_text = ''.join(stream_sectioned_script(model, common_patterns, theme, title, thumbnail_word, target_chars, use_cache)).strip()
+    return script_text, len(script_text)
+
+
+def _fetch_transcript(model, video_id: str, is_shorts: bool) -> Optional[str]:
+    transcript = get_transcript(video_id)
+    # ショート動画で字幕がない場合、音声から文字起こしを試みる
+    if is_shorts and not transcript and model:
+        transcript = transcribe_shorts_audio(model, video_id)
+    return transcript
+
+
+# 以下はセッションをまたいで共有する版。同じ動画の同時実行は1回にまとめる
+
+def _shared_video_info(video_id: str, is_shorts: bool) -> dict:
+    return get_shared_cache().get_or_load(
+        ('video_info', video_id, is_shorts),
+        lambda: get_video_info(video_id, is_shorts),
+        cacheable=lambda info: 'error' not in info,
+    )
+
+
+def _shared_transcript(model, video_id: str, is_shorts: bool) -> Optional[str]:
+    return get_shared_cache().get_or_load(
+        ('transcript', video_id, is_shorts),
+        lambda: _fetch_transcript(model, video_id, is_shorts),
+        cacheable=lambda transcript: transcript is not None,
+    )
+
+
+def _shared_analysis(model, video_info: dict, transcript: Optional[str], use_cache: bool) -> VideoResult:
+    # 同じモデル・同じ入力（動画と字幕）なら同じ分析。use_cache=False は保存済みを使わず分析し直す
+    key = ('analysis', getattr(model, 'model_name', None), video_info['video_id'], video_info.get('url'), hash(transcript))
+    return get_shared_cache().get_or_load(
+        key,
+        lambda: analyze_video_with_gemini(model, video_info, transcript, use_cache),
+        cacheable=lambda result: result.success,
+        refresh=not use_cache,
+    )
+
+
+def run_analysis_pipeline(
+    model,
+    videos: List[dict],
+    fetch_workers: int = FETCH_WORKERS,
+    gemini_workers: int = GEMINI_WORKERS,
+    should_stop: Optional[Callable[[], bool]] = None,
+    use_cache: bool = True,
+    ordered: bool = True,
+) -> Iterator[Tuple[int, VideoResult]]:
+    """動画情報・字幕取得とGemini分析を並行実行し、(index, result) を入力順に返す（ordered=Falseなら完了順）
+
+    取得段（動画情報と字幕は別タスク）はfetch_workers、分析段はgemini_workersで同時実行数を制限。
+    両方の取得が終わった動画から順に分析へ投入するので、取得と分析が重なって進む。
+    should_stop() がTrueになったら未着手のタスクをキャンセルして終了する。
+    use_cache=False でGeminiの分析結果キャッシュを使わずに再分析する。
+    取得・分析の結果はプロセス共有のキャッシュ（shared_cache）に置き、他のセッションと
+    同じ動画を同時に処理している場合はその完了を待って結果を共有する。
+    """
+    fetch_pool = ThreadPoolExecutor(max_workers=max(1, fetch_workers), thread_name_prefix='fetch')
+    gemini_pool = ThreadPoolExecutor(max_workers=max(1, gemini_workers), thread_name_prefix='gemini')
+
+    try:
+        # future -> (動画のindex, 段階)
+        stage = {}
+        inputs = [{} for _ in videos]
+        for i, vdata in enumerate(videos):
+            # URLからショートかどうか判定
+            is_shorts = 'shorts' in vdata.get('url', '')
+            stage[fetch_pool.submit(_shared_video_info, vdata['video_id'], is_shorts)] = (i, 'video_info')
+            stage[fetch_pool.submit(_shared_transcript, model, vdata['video_id'], is_shorts)] = (i, 'transcript')
+
+        results = {}
+        next_index = 0
+        while next_index < len(videos):
+            if should_stop and should_stop():
+                return
+
+            # 入力順で次の結果が揃っていれば返す
+            ready = next_index if ordered else next(iter(results), None)
+            if ready in results:
+                yield ready, results.pop(ready)
+                next_index += 1
+                continue
+
+            done, _ = wait(list(stage), timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, kind = stage.pop(future)
+                if i in results:
+                    continue
+                try:
+                    value = future.result()
+                except Exception as e:
+                    results[i] = VideoResult.failure(videos[i]['video_id'], str(e), url=videos[i].get('url'))
+                    continue
+
+                if kind == 'analysis':
+                    results[i] = value
+                    continue
+
+                inputs[i][kind] = value
+                if len(inputs[i]) == 2:
+                    # 動画情報と字幕が揃ったら分析段へ
+                    analysis = gemini_pool.submit(
+                        _shared_analysis, model, inputs[i]['video_info'], inputs[i]['transcript'], use_cache
+                    )
+                    stage[analysis] = (i, 'analysis')
+    finally:
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        gemini_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,75 @@
+"""APIキーごとのGeminiクライアント
+
+genai.configure はプロセス全体の設定なので、利用者ごとに別のAPIキーを使うと
+後から設定したキーで他の利用者の呼び出しまで送られてしまう。ここでは生成・ファイル・
+コンテキストキャッシュの各クライアントをキーから明示的に作り、モデルに結び付けておく。
+"""
+import threading
+from typing import Optional
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+
+
+class GeminiClients:
+    """1つのAPIキー専用のクライアント（サービスごとに初回の利用時に作る）"""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, service: str):
+        with self._lock:
+            client = self._clients.get(service)
+            if client is None:
+                import google.ai.generativelanguage as glm
+                from google.generativeai import client as genai_client
+
+                options = {'api_key': self.api_key}
+                if service == 'file':
+                    # アップロードはSDK側のサブクラスにしかない
+                    client = genai_client.FileServiceClient(client_options=options)
+                else:
+                    client = getattr(glm, f"{service.title()}ServiceClient")(client_options=options)
+                self._clients[service] = client
+            return client
+
+    @property
+    def generative(self):
+        return self._get('generative')
+
+    @property
+    def cache(self):
+        return self._get('cache')
+
+    @property
+    def file(self):
+        return self._get('file')
+
+
+def create_model(api_key: str, model_name: str = GEMINI_MODEL_NAME):
+    """このAPIキーのクライアントで呼び出すモデルを作る（genai.configure は使わない）"""
+    import google.generativeai as genai
+
+    clients = GeminiClients(api_key)
+    model = genai.GenerativeModel(model_name)
+    # SDKにクライアントを渡す引数がないため、未設定時に既定のクライアントが使われる前に入れておく
+    model._client = clients.generative
+    model.gemini_clients = clients
+    return model
+
+
+def clients_of(model) -> Optional[GeminiClients]:
+    """モデルに結び付いたクライアント（create_model 以外で作ったモデルはNone）"""
+    return getattr(model, 'gemini_clients', None)
+
+
+def upload_file(clients: GeminiClients, data, mime_type: str):
+    """このキーでファイルをアップロードする（戻り値はそのまま generate_content に渡せる）"""
+    return clients.file.create_file(data, mime_type=mime_type)
+
+
+def delete_file(clients: GeminiClients, file):
+    from google.generativeai import protos
+
+    clients.file.delete_file(request=protos.DeleteFileRequest(name=file.name))
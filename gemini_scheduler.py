@@ -0,0 +1,266 @@
+"""Gemini呼び出しスケジューラ
+
+APIキーごとに、すべてのGemini呼び出しを1つのキューに積み、RPM（リクエスト/分）とTPM（トークン/分）の
+トークンバケットで送出を制御する。429などのクォータエラーは呼び出し側でsleepせず、
+サーバーのリトライ指示（retry_delay）またはジッター付き指数バックオフの時刻まで
+キューに戻して再送する。
+"""
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from gemini_client import clients_of
+
+# 既定値は gemini-2.0-flash の無料枠。有料枠では環境変数で引き上げる
+GEMINI_RPM = int(os.environ.get('TUBEHACKER_GEMINI_RPM', '15'))
+GEMINI_TPM = int(os.environ.get('TUBEHACKER_GEMINI_TPM', '1000000'))
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('TUBEHACKER_GEMINI_CONCURRENCY', '4'))
+GEMINI_MAX_RETRIES = int(os.environ.get('TUBEHACKER_GEMINI_RETRIES', '4'))
+
+BACKOFF_BASE = 2.0  # 秒
+BACKOFF_MAX = 90.0  # 秒
+
+# 画像1枚あたりの概算トークン数
+IMAGE_TOKENS = 258
+
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)'),
+    re.compile(r'retry in\s*([\d.]+)\s*s', re.IGNORECASE),
+    re.compile(r'Retry-After:\s*([\d.]+)', re.IGNORECASE),
+]
+
+
+class TokenBucket:
+    """1分あたりの上限から補充されるトークンバケット（スレッドセーフではない。呼び出し側でロックする）"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """amount分のトークンが貯まるまでの秒数（0なら即時取得可能）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        # 実測値での補正で負になることもある（その分だけ次の送出が遅れる）
+        self.tokens -= amount
+
+
+def estimate_tokens(contents) -> int:
+    """送信内容のトークン数を概算"""
+    if isinstance(contents, str):
+        # 日本語は1文字≒1トークン、英数字は4文字≒1トークン
+        ascii_chars = sum(1 for c in contents if ord(c) < 128)
+        return (len(contents) - ascii_chars) + ascii_chars // 4 + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents)
+    return IMAGE_TOKENS
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    if getattr(error, 'code', None) == 429:
+        return True
+    error_str = str(error).lower()
+    return '429' in error_str or 'quota' in error_str or 'rate limit' in error_str or 'resource has been exhausted' in error_str
+
+
+def is_transient_error(error: Exception) -> bool:
+    return getattr(error, 'code', None) in (500, 502, 503, 504)
+
+
+def retry_hint(error: Exception) -> Optional[float]:
+    """サーバーが返したリトライまでの待機秒数（なければNone）"""
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is not None and hasattr(delay, 'seconds'):
+            return delay.seconds + getattr(delay, 'nanos', 0) / 1e9
+    error_str = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(error_str)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'kwargs', 'tokens', 'future', 'attempt')
+
+    def __init__(self, fn, args, kwargs, tokens):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.tokens = tokens
+        self.future = Future()
+        self.attempt = 0
+
+
+class GeminiScheduler:
+    """RPM/TPM予算内でGemini呼び出しを送出するキュー"""
+
+    def __init__(
+        self,
+        rpm: int = GEMINI_RPM,
+        tpm: int = GEMINI_TPM,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        max_retries: int = GEMINI_MAX_RETRIES,
+    ):
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_retries = max_retries
+        self._queue = []  # (送出可能時刻, 連番, job)
+        self._seq = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix='gemini-call')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='gemini-scheduler', daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, fn: Callable, *args, tokens: Optional[int] = None, **kwargs) -> Future:
+        """呼び出しをキューに積み、結果のFutureを返す"""
+        if tokens is None:
+            tokens = estimate_tokens(args[0]) if args else 1
+        job = _Job(fn, args, kwargs, tokens)
+        self._enqueue(job, time.monotonic())
+        return job.future
+
+    def call(self, fn: Callable, *args, tokens: Optional[int] = None, **kwargs):
+        """submitして結果を待つ"""
+        return self.submit(fn, *args, tokens=tokens, **kwargs).result()
+
+    def _enqueue(self, job: _Job, ready_at: float):
+        with self._cond:
+            heapq.heappush(self._queue, (ready_at, next(self._seq), job))
+            self._cond.notify_all()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    ready_at, _, job = self._queue[0]
+                    if job.future.cancelled():
+                        heapq.heappop(self._queue)
+                        continue
+                    now = time.monotonic()
+                    wait_for = max(ready_at, self._paused_until) - now
+                    if wait_for <= 0:
+                        wait_for = max(
+                            self._requests.wait_time(1, now),
+                            self._tokens.wait_time(job.tokens, now),
+                        )
+                    if wait_for <= 0 and self._active < self._max_concurrency:
+                        heapq.heappop(self._queue)
+                        self._requests.consume(1, now)
+                        self._tokens.consume(job.tokens, now)
+                        self._active += 1
+                        break
+                    # 予算が貯まる時刻か、実行中の呼び出しが終わるまで待つ
+                    self._cond.wait(timeout=wait_for if wait_for > 0 else None)
+            self._pool.submit(self._execute, job)
+
+    def _execute(self, job: _Job):
+        if job.attempt == 0 and not job.future.set_running_or_notify_cancel():
+            self._release()
+            return
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            self._release()
+            self._handle_error(job, e)
+            return
+
+        # 実際の使用トークン数で予算を補正
+        usage = getattr(getattr(result, 'usage_metadata', None), 'total_token_count', None)
+        with self._cond:
+            if isinstance(usage, int) and usage > 0:
+                self._tokens.consume(usage - job.tokens, time.monotonic())
+            self._active -= 1
+            self._cond.notify_all()
+        job.future.set_result(result)
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _handle_error(self, job: _Job, error: Exception):
+        rate_limited = is_rate_limit_error(error)
+        if not (rate_limited or is_transient_error(error)) or job.attempt >= self._max_retries:
+            job.future.set_exception(error)
+            return
+
+        job.attempt += 1
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** job.attempt))
+        delay = random.uniform(backoff / 2, backoff)  # ジッター
+        hint = retry_hint(error)
+        if hint is not None:
+            delay = max(delay, hint + random.uniform(0, 1))
+
+        now = time.monotonic()
+        if rate_limited:
+            # クォータ超過中は他の呼び出しも送出しない
+            with self._cond:
+                self._paused_until = max(self._paused_until, now + delay)
+        self._enqueue(job, now + delay)
+
+
+_schedulers = {}  # APIキー（不明ならNone） -> スケジューラ
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(api_key: Optional[str] = None) -> GeminiScheduler:
+    """APIキーごとのスケジューラを取得（初回のみ作成）
+
+    RPM/TPMの上限と429による一時停止はキーごとのクォータなので、キー同士で共有しない。
+    """
+    scheduler = _schedulers.get(api_key)
+    if scheduler is None:
+        with _scheduler_lock:
+            scheduler = _schedulers.get(api_key)
+            if scheduler is None:
+                scheduler = _schedulers[api_key] = GeminiScheduler()
+    return scheduler
+
+
+def scheduler_for(model) -> GeminiScheduler:
+    """モデルのAPIキーのスケジューラ（キーが分からないモデルは共通のもの）"""
+    clients = clients_of(model)
+    return get_scheduler(clients.api_key if clients is not None else None)
+
+
+def generate_content(model, contents, **kwargs):
+    """スケジューラ経由で model.generate_content を呼び出す"""
+    return scheduler_for(model).call(model.generate_content, contents, tokens=estimate_tokens(contents), **kwargs)
+
+
+def stream_content(model, contents, **kwargs):
+    """スケジューラ経由でストリーミング生成を開始する（最初のチャンク受信までがキュー管理の対象）"""
+    return scheduler_for(model).call(model.generate_content, contents, tokens=estimate_tokens(contents), stream=True, **kwargs)
+
+
+def count_content_tokens(model, contents):
+    """スケジューラ経由で model.count_tokens を呼び出す（RPMは消費するが、生成のTPMは消費しない）"""
+    return scheduler_for(model).call(model.count_tokens, contents, tokens=0)
@@ -0,0 +1,75 @@
+"""YouTube取得用の共有HTTPクライアント
+
+プロセス全体で1つのkeep-alive Sessionを使い回し、
+youtube.com / img.youtube.com へのTCP+TLSハンドシェイクを毎回やり直さないようにする。
+"""
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+# ホストごとのコネクションプール数と、1ホストあたりの同時接続数上限
+POOL_CONNECTIONS = int(os.environ.get('TUBEHACKER_POOL_CONNECTIONS', '8'))
+POOL_MAXSIZE = int(os.environ.get('TUBEHACKER_POOL_MAXSIZE', '16'))
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'ja-JP,ja;q=0.9,en;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE) -> 'requests.Session':
+    """プール設定済みのSessionを作成（requestsは最初のリクエスト時に読み込む）"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    # 接続エラーと一時的な5xxのみ軽くリトライ（429はリトライしない）
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    # pool_block=True で1ホストあたりの同時接続数をpool_maxsizeに制限
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> 'requests.Session':
+    """プロセス共有のSessionを取得（初回のみ作成）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def http_get(url: str, timeout: float = 15, **kwargs) -> 'requests.Response':
+    """共有Session経由でGET"""
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def http_post_json(url: str, payload: dict, timeout: float = 15, **kwargs) -> 'requests.Response':
+    """共有Session経由でJSONをPOST"""
+    return get_session().post(url, json=payload, timeout=timeout, **kwargs)
@@ -0,0 +1,170 @@
+"""バックグラウンドジョブ
+
+分析・生成をStreamlitのスクリプト実行とは別のスレッドで実行する。
+スクリプトはウィジェット操作のたびに最初から再実行され、実行中の処理は打ち切られるため、
+UIはジョブを投入してIDだけを覚えておき、再実行のたびに進捗と結果を取りに来る。
+ジョブはプロセス共有なので、ページを再読み込みしてもIDが分かれば続きを表示できる。
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Iterator, List, Optional
+
+from checkpoint import run_resumable_pipeline
+from models import VideoResult
+
+JOB_WORKERS = int(os.environ.get('TUBEHACKER_JOB_WORKERS', '8'))
+# 終了したジョブを保持する秒数（この間に取りに来なければ破棄）
+JOB_RETENTION = int(os.environ.get('TUBEHACKER_JOB_RETENTION', '3600'))
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    """実行状態・途中経過・結果を持つジョブ（ワーカーとUIの両方から参照される）"""
+
+    def __init__(self, kind: str, meta: Optional[dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = meta or {}
+        self.status = PENDING
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._results = {}  # index -> 動画ごとの結果
+        self._chunks = []
+        self._length = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def add_result(self, index: int, result: VideoResult):
+        with self._lock:
+            self._results[index] = result
+
+    def results(self) -> List[VideoResult]:
+        """揃った結果を入力順で"""
+        with self._lock:
+            return [self._results[i] for i in sorted(self._results)]
+
+    def append_text(self, chunk: str):
+        with self._lock:
+            self._chunks.append(chunk)
+            self._length += len(chunk)
+
+    @property
+    def text(self) -> str:
+        with self._lock:
+            return ''.join(self._chunks)
+
+    @property
+    def text_length(self) -> int:
+        return self._length
+
+    def _finish(self, status: str, result=None, error: Optional[str] = None):
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.status = status
+
+
+class JobRunner:
+    """ジョブを受け付けてスレッドプールで実行する"""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, retention: float = JOB_RETENTION):
+        self.retention = retention
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='job')
+
+    def submit(self, kind: str, fn: Callable, *args, meta: Optional[dict] = None, **kwargs) -> Job:
+        """fn(job, *args, **kwargs) をバックグラウンドで実行する。戻り値がjob.resultになる"""
+        job = Job(kind, meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        if job.cancelled():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        try:
+            result = fn(job, *args, **kwargs)
+        except Exception as e:
+            print(f"ジョブエラー ({job.kind}): {e}")
+            job._finish(FAILED, error=str(e))
+            return
+        job._finish(CANCELLED if job.cancelled() else DONE, result)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished_at > self.retention]:
+            del self._jobs[job_id]
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """プロセス共有のジョブランナーを取得（初回のみ作成）"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner()
+    return _runner
+
+
+def analysis_job(job: Job, model, videos: List[dict], use_cache: bool = True) -> List[VideoResult]:
+    """動画を分析し、終わったものから job に追加する。停止された場合はそこまでの結果を返す
+
+    同じ動画の組み合わせで分析済みの動画はチェックポイントから復元する（use_cache=Falseなら再分析）。
+    """
+    job.total = len(videos)
+    pipeline = run_resumable_pipeline(
+        model, videos, resume=use_cache, should_stop=job.cancelled, use_cache=use_cache, ordered=False
+    )
+    for i, result in pipeline:
+        job.add_result(i, result)
+    return job.results()
+
+
+def text_job(job: Job, chunks: Iterator[str]) -> str:
+    """ストリーミング生成のチャンクを job に追加し、全文を返す"""
+    with closing(chunks):
+        for chunk in chunks:
+            if job.cancelled():
+                break
+            job.append_text(chunk)
+    return job.text
@@ -0,0 +1,142 @@
+"""動画ごとの分析結果
+
+分析パイプライン・チェックポイント・バッチ出力・UIで共通の1つの形。
+セッションには利用者ごとに動画数分の結果が残るので、__slots__ で属性辞書を持たず、
+長い文字起こし・分析テキストはzlib圧縮したUTF-8のバイト列で1回だけ保持する
+（読むときに展開する）。サムネイルは縮小済みJPEGのバイト列のまま持つ。
+"""
+import zlib
+from typing import Optional, Tuple
+
+# これより短いテキストは圧縮しない（ヘッダ分で逆に大きくなるため）
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 6
+
+_RAW = b'\x00'
+_ZLIB = b'\x01'
+
+
+def _pack(text: Optional[str]) -> Optional[bytes]:
+    if text is None:
+        return None
+    data = text.encode('utf-8')
+    if len(data) < COMPRESS_MIN_BYTES:
+        return _RAW + data
+    return _ZLIB + zlib.compress(data, COMPRESS_LEVEL)
+
+
+def _unpack(data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
+    if data[:1] == _ZLIB:
+        return zlib.decompress(data[1:]).decode('utf-8')
+    return data[1:].decode('utf-8')
+
+
+class VideoResult:
+    """1動画の分析結果（成功・失敗とも同じ形）"""
+
+    __slots__ = (
+        'video_id', 'url', 'title', 'thumbnail_url', 'thumbnail', 'thumbnail_size',
+        'success', 'error', 'is_shorts', 'has_transcript', 'char_count',
+        '_analysis', '_transcript',
+    )
+
+    def __init__(
+        self,
+        video_id: str,
+        url: Optional[str] = None,
+        title: Optional[str] = None,
+        thumbnail_url: Optional[str] = None,
+        thumbnail: Optional[bytes] = None,
+        thumbnail_size: Optional[Tuple[int, int]] = None,
+        success: bool = False,
+        error: Optional[str] = None,
+        is_shorts: bool = False,
+        has_transcript: bool = False,
+        char_count: int = 0,
+        analysis: Optional[str] = None,
+        transcript: Optional[str] = None,
+    ):
+        self.video_id = video_id
+        self.url = url or f"https://www.youtube.com/watch?v={video_id}"
+        self.title = title
+        self.thumbnail_url = thumbnail_url
+        self.thumbnail = thumbnail
+        self.thumbnail_size = tuple(thumbnail_size) if thumbnail_size else None
+        self.success = bool(success)
+        self.error = error
+        self.is_shorts = bool(is_shorts)
+        self.has_transcript = bool(has_transcript)
+        self.char_count = char_count or 0
+        self._analysis = _pack(analysis)
+        self._transcript = _pack(transcript)
+
+    @property
+    def analysis(self) -> Optional[str]:
+        return _unpack(self._analysis)
+
+    @property
+    def transcript(self) -> Optional[str]:
+        return _unpack(self._transcript)
+
+    @classmethod
+    def from_video_info(cls, video_info: dict, **fields) -> 'VideoResult':
+        """get_video_info の戻り値と分析結果から作る"""
+        fields.setdefault('is_shorts', video_info.get('is_shorts', False))
+        return cls(
+            video_id=video_info.get('video_id'),
+            url=video_info.get('url'),
+            title=video_info.get('title'),
+            thumbnail_url=video_info.get('thumbnail_url'),
+            thumbnail=video_info.get('thumbnail_bytes'),
+            thumbnail_size=video_info.get('thumbnail_size'),
+            **fields,
+        )
+
+    @classmethod
+    def failure(cls, video_id: str, error: str, title: str = 'エラー', **fields) -> 'VideoResult':
+        return cls(video_id=video_id, title=title, error=error, success=False, **fields)
+
+    @classmethod
+    def from_record(cls, record: dict, thumbnail: Optional[bytes] = None) -> 'VideoResult':
+        """to_record の出力から復元する（旧形式の video_info 入りの辞書も読める）"""
+        if 'video_info' in record:
+            video_info = dict(record['video_info'])
+            if thumbnail is not None:
+                video_info['thumbnail_bytes'] = thumbnail
+            fields = {k: record.get(k) for k in ('success', 'error', 'has_transcript', 'char_count', 'analysis', 'transcript')}
+            if 'is_shorts' in record:
+                fields['is_shorts'] = record['is_shorts']
+            return cls.from_video_info(video_info, **fields)
+        fields = {k: v for k, v in record.items() if k in _RECORD_FIELDS}
+        return cls(thumbnail=thumbnail, **fields)
+
+    def to_record(self, include_transcript: bool = False) -> dict:
+        """JSONに書ける辞書（サムネイルのバイト列は含めない）"""
+        record = {
+            'video_id': self.video_id,
+            'url': self.url,
+            'title': self.title,
+            'thumbnail_url': self.thumbnail_url,
+            'thumbnail_size': list(self.thumbnail_size) if self.thumbnail_size else None,
+            'success': self.success,
+            'error': self.error,
+            'is_shorts': self.is_shorts,
+            'has_transcript': self.has_transcript,
+            'char_count': self.char_count,
+            'analysis': self.analysis,
+        }
+        if include_transcript:
+            record['transcript'] = self.transcript
+        return record
+
+    def __repr__(self) -> str:
+        state = 'success' if self.success else f"error={self.error!r}"
+        return f"VideoResult({self.video_id!r}, {self.title!r}, {state})"
+
+
+_RECORD_FIELDS = frozenset((
+    'video_id', 'url', 'title', 'thumbnail_url', 'thumbnail_size', 'success', 'error',
+    'is_shorts', 'has_transcript', 'char_count', 'analysis', 'transcript',
+))
@@ -0,0 +1,117 @@
+"""プロンプトのトークン予算
+
+文字数ではなくトークン数でプロンプトに入れるテキストを切り詰める。
+トークン数はまずローカルで概算し、予算ぎりぎりで判定が微妙な場合だけ
+model.count_tokens で実測する。切り詰める前に、フィラーや自動字幕の重複など
+情報量の少ない部分を取り除く。
+"""
+import hashlib
+import os
+import re
+
+from gemini_scheduler import count_content_tokens, estimate_tokens as _estimate_contents
+from shared_cache import TTLCache
+
+# 呼び出しごとの予算（トークン）
+TRANSCRIPT_TOKENS = int(os.environ.get('TUBEHACKER_TRANSCRIPT_TOKENS', '9000'))
+SHORTS_TRANSCRIPT_TOKENS = int(os.environ.get('TUBEHACKER_SHORTS_TRANSCRIPT_TOKENS', '2500'))
+IDEAS_PATTERNS_TOKENS = int(os.environ.get('TUBEHACKER_IDEAS_PATTERNS_TOKENS', '9000'))
+SCRIPT_PATTERNS_TOKENS = int(os.environ.get('TUBEHACKER_SCRIPT_PATTERNS_TOKENS', '4000'))
+PATTERNS_INPUT_TOKENS = int(os.environ.get('TUBEHACKER_PATTERNS_INPUT_TOKENS', '16000'))
+
+# 概算が予算のこの割合以内に入ったらcount_tokensで実測する
+COUNT_TOKENS_MARGIN = 0.15
+
+# 文の区切りで切るために、切り詰め位置から遡って探す文字数
+_BOUNDARY_LOOKBACK = 200
+_BOUNDARIES = '。！？!?.\n 　'
+
+# 日本語のフィラーは語の一部（「ああーん」「ままぁ」など）を消さないよう、前後が句読点・空白・行頭行末のときだけ
+_FILLERS = re.compile(
+    r'(?<![^\s、。,.!?！？「」])(?:えー+と?|えっと|ええと|あのー+|そのー+|うーん+|んー+|まぁ+|あー+)'
+    r'(?=[\s、。,.!?！？「」]|$)[、,]?[ \t　]*'
+    r'|\b(?:um+|uh+|erm|hmm+)\b[,.]?\s*'
+    r'|\[(?:音楽|拍手|笑い|Music|Applause|Laughter)\]\s*',
+    re.IGNORECASE,
+)
+# 自動字幕で連続して繰り返されるフレーズ。空白・改行で区切られた語（行）単位の繰り返しだけを対象にし、
+# 語の途中（12341234、URLなど）や数字だけの繰り返し（2020 2020）は残す
+_REPEATS = re.compile(r'(?<!\S)(?=\S*[^\W\d_])(\S.{0,80}?\S)(?:\s+\1)+(?!\S)')
+_SPACES = re.compile(r'[ \t　]{2,}')
+
+_count_cache = TTLCache(max_entries=1024, ttl=24 * 3600)
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（文字列を1回走査するだけなのでキャッシュしない）"""
+    return _estimate_contents(text)
+
+
+def count_tokens(text: str, model=None) -> int:
+    """modelがあればcount_tokensで実測、失敗したら概算
+
+    count_tokens もAPIリクエストとしてRPMに数えられるので、生成と同じスケジューラを通す。
+    """
+    if model is None or not hasattr(model, 'count_tokens'):
+        return estimate_tokens(text)
+    key = (getattr(model, 'model_name', ''), hashlib.sha256(text.encode('utf-8')).digest())
+    counted = _count_cache.get(key)
+    if counted is not None:
+        return counted
+    try:
+        counted = int(count_content_tokens(model, text).total_tokens)
+    except Exception as e:
+        print(f"トークン数の取得エラー: {e}")
+        return estimate_tokens(text)
+    _count_cache.put(key, counted)
+    return counted
+
+
+def compress_text(text: str) -> str:
+    """フィラー・効果音表記・連続する重複フレーズ・余分な空白を取り除く"""
+    text = _FILLERS.sub('', text)
+    text = _REPEATS.sub(r'\1', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def _cut(text: str, budget: int) -> str:
+    """概算でbudgetトークンに収まる位置で、できるだけ文の区切りに合わせて切る"""
+    used = 0.0
+    for i, c in enumerate(text):
+        used += 1.0 if ord(c) >= 128 else 0.25
+        if used > budget:
+            break
+    else:
+        return text
+    window = text[max(0, i - _BOUNDARY_LOOKBACK):i]
+    boundary = max(window.rfind(b) for b in _BOUNDARIES)
+    if boundary >= 0:
+        i = i - len(window) + boundary + 1
+    return text[:i].rstrip()
+
+
+def fit_to_budget(text: str, budget: int, model=None, compress: bool = True) -> str:
+    """textをbudgetトークン以内に収める
+
+    予算に余裕があれば概算だけで判定し、境界付近（±COUNT_TOKENS_MARGIN）の場合のみ
+    実測値で概算を補正してから切り詰める。
+    """
+    if not text:
+        return text
+    if compress:
+        text = compress_text(text)
+    estimate = estimate_tokens(text)
+    if estimate <= budget * (1 - COUNT_TOKENS_MARGIN):
+        return text
+    if estimate > budget * (1 + COUNT_TOKENS_MARGIN) or model is None:
+        return _cut(text, budget)
+
+    actual = count_tokens(text, model)
+    if actual <= budget:
+        return text
+    # 概算と実測の比で予算を換算して切る
+    fitted = _cut(text, int(budget * estimate / actual))
+    if count_tokens(fitted, model) > budget:
+        fitted = _cut(fitted, int(budget * estimate / actual * (1 - COUNT_TOKENS_MARGIN)))
+    return fitted
+
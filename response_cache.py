@@ -0,0 +1,89 @@
+"""Geminiレスポンスのメモ化
+
+プロンプトは入力から決まるため、モデル名・プロンプト・画像バイト列のハッシュをキーに
+生成テキストを保存し、同じ入力の再実行ではGeminiを呼ばずに返す。
+"""
+import hashlib
+import os
+from typing import Iterator
+
+from gemini_scheduler import generate_content, stream_content
+from shared_cache import TTLCache
+
+RESPONSE_CACHE_TTL = int(os.environ.get('TUBEHACKER_RESPONSE_CACHE_TTL', str(6 * 3600)))  # 秒
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('TUBEHACKER_RESPONSE_CACHE_MAX_ENTRIES', '512'))
+
+
+_cache = TTLCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL)
+
+
+def _digest_part(part) -> bytes:
+    if isinstance(part, str):
+        return part.encode('utf-8')
+    if isinstance(part, (bytes, bytearray)):
+        return hashlib.sha256(part).digest()
+    if isinstance(part, dict) and 'data' in part:
+        return hashlib.sha256(part['data']).digest()
+    if hasattr(part, 'tobytes'):
+        # PIL Image
+        return hashlib.sha256(part.tobytes()).digest()
+    # アップロード済みファイルなどは名前で識別
+    return str(getattr(part, 'name', repr(part))).encode('utf-8')
+
+
+def make_key(model_name: str, contents) -> str:
+    """モデル名・プロンプト・画像からキャッシュキーを作成"""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    h = hashlib.sha256(model_name.encode('utf-8'))
+    for part in parts:
+        h.update(b'\x00')
+        h.update(_digest_part(part))
+    return h.hexdigest()
+
+
+def generate_text(model, contents, use_cache: bool = True) -> str:
+    """キャッシュを確認してからGeminiで生成（use_cache=Falseで再生成し、結果は上書き保存）"""
+    key = make_key(getattr(model, 'model_name', ''), contents)
+    if use_cache:
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+    text = generate_content(model, contents).text
+    _cache.put(key, text)
+    return text
+
+
+def stream_text(model, contents, use_cache: bool = True) -> Iterator[str]:
+    """生成テキストをチャンクごとに返す（キャッシュ済みなら全文を1回で返す）
+
+    最後まで受信できた場合のみキャッシュに保存する。途中で閉じられた場合はストリームを中断する。
+    """
+    key = make_key(getattr(model, 'model_name', ''), contents)
+    if use_cache:
+        cached = _cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    response = stream_content(model, contents)
+    parts = []
+    completed = False
+    try:
+        for chunk in response:
+            text = chunk.text
+            parts.append(text)
+            yield text
+        completed = True
+    finally:
+        if completed:
+            _cache.put(key, ''.join(parts))
+        else:
+            # 残りのトークンを生成させないよう下位のストリームを切断
+            cancel = getattr(getattr(response, '_iterator', None), 'cancel', None)
+            if cancel:
+                cancel()
+
+
+def get_response_cache() -> TTLCache:
+    return _cache
+
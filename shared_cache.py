@@ -0,0 +1,175 @@
+"""プロセス共有のキャッシュと同時実行の合流（single-flight）
+
+Streamlitのセッションをまたいで、動画情報・字幕・分析結果をプロセス内で共有する。
+同じキーの処理が実行中なら、後から来た呼び出しは新しく実行せずにその結果を待つので、
+同じ人気動画を10人が同時に分析してもYouTubeへの取得とGeminiへの分析は1回で済む。
+保持する量は件数と推定バイト数の両方で上限を設け、古いものから捨てる（LRU + TTL）。
+TTLCache はその土台のLRU + TTLで、Geminiの応答キャッシュなどはこちらを直接使う。
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Hashable, Optional
+
+SHARED_CACHE_TTL = int(os.environ.get('TUBEHACKER_SHARED_CACHE_TTL', '3600'))  # 秒
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get('TUBEHACKER_SHARED_CACHE_MAX_ENTRIES', '2048'))
+SHARED_CACHE_MAX_BYTES = int(os.environ.get('TUBEHACKER_SHARED_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+
+def estimate_size(value) -> int:
+    """保持に使うおおよそのバイト数（辞書・__slots__ のオブジェクトは1段だけたどる）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif hasattr(value, '__slots__'):
+        size += sum(sys.getsizeof(getattr(value, name, None)) for name in value.__slots__)
+    return size
+
+
+class TTLCache:
+    """TTLつきLRUキャッシュ（スレッドセーフ）。max_bytes を指定すると推定バイト数の合計も制限する"""
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (保存時刻, バイト数, 値)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        """期限内のエントリ（ロックを持った状態で呼ぶ）"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value):
+        size = estimate_size(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._data),
+                'bytes': self._bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+class SharedCache(TTLCache):
+    """件数・バイト数上限とTTLつきのLRUキャッシュ。get_or_load で同じキーの実行を1回にまとめる"""
+
+    def __init__(
+        self,
+        max_entries: int = SHARED_CACHE_MAX_ENTRIES,
+        max_bytes: int = SHARED_CACHE_MAX_BYTES,
+        ttl: float = SHARED_CACHE_TTL,
+    ):
+        super().__init__(max_entries, ttl, max_bytes)
+        self.coalesced = 0
+        self._inflight = {}  # key -> Future
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], object],
+        cacheable: Optional[Callable[[object], bool]] = None,
+        refresh: bool = False,
+    ):
+        """キャッシュにあれば返し、なければ loader() を実行して保存する
+
+        同じキーを実行中の呼び出しがあれば、その完了を待って同じ結果（例外も同じ）を返す。
+        cacheable(value) がFalseの結果（一時的な失敗など）は保存しない。
+        refresh=True ならキャッシュは読まずに実行し直す（実行中の呼び出しがあればそれに合流する）。
+        """
+        with self._lock:
+            entry = None if refresh else self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        if cacheable is None or cacheable(value):
+            self.put(key, value)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats['coalesced'] = self.coalesced
+            stats['inflight'] = len(self._inflight)
+        return stats
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedCache:
+    """プロセス共有のキャッシュを取得（初回のみ作成）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache()
+    return _cache
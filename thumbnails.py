@@ -0,0 +1,70 @@
+"""サムネイル取得・縮小
+
+maxresdefault と hqdefault を同時に取得して良い方を採用し、Geminiの画像タイル（768px）に
+収まるサイズへ一度だけ縮小したJPEGバイト列として保持する。デコード済みのPIL画像は保持しない。
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+from http_client import http_get
+
+# 768px以下なら画像1枚＝1タイル（258トークン）で送信される
+THUMBNAIL_MAX_SIZE = int(os.environ.get('TUBEHACKER_THUMBNAIL_MAX_SIZE', '768'))
+THUMBNAIL_JPEG_QUALITY = int(os.environ.get('TUBEHACKER_THUMBNAIL_JPEG_QUALITY', '85'))
+
+# 優先順
+_RESOLUTIONS = ('maxresdefault', 'hqdefault')
+
+_probe_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='thumbnail')
+
+
+def _get(url: str) -> Optional[bytes]:
+    response = http_get(url, timeout=10)
+    return response.content if response.status_code == 200 else None
+
+
+def downscale(data: bytes, max_size: int = THUMBNAIL_MAX_SIZE) -> dict:
+    """max_size 以内に縮小したJPEGを {'data', 'width', 'height'} で返す（縮小不要ならそのまま）"""
+    from PIL import Image
+
+    image = Image.open(BytesIO(data))
+    if image.width <= max_size and image.height <= max_size and image.format == 'JPEG':
+        return {'data': data, 'width': image.width, 'height': image.height}
+
+    image.draft('RGB', (max_size, max_size))  # JPEGはデコード時点で縮小
+    image = image.convert('RGB')
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    out = BytesIO()
+    image.save(out, format='JPEG', quality=THUMBNAIL_JPEG_QUALITY, optimize=True)
+    return {'data': out.getvalue(), 'width': image.width, 'height': image.height}
+
+
+def fetch_thumbnail(video_id: str) -> Optional[dict]:
+    """サムネイルを取得し {'url', 'data', 'width', 'height'} を返す（取得できなければNone）"""
+    urls = [f"https://img.youtube.com/vi/{video_id}/{name}.jpg" for name in _RESOLUTIONS]
+    futures = [_probe_pool.submit(_get, url) for url in urls]
+    for url, future in zip(urls, futures):
+        try:
+            data = future.result()
+        except Exception:
+            data = None
+        if data:
+            return {'url': url, **downscale(data)}
+    return None
+
+
+def image_size(data: bytes) -> tuple:
+    """JPEGのヘッダーから (幅, 高さ) を取得（ピクセルはデコードしない）"""
+    from PIL import Image
+
+    return Image.open(BytesIO(data)).size
+
+
+def thumbnail_part(video_info: dict) -> Optional[dict]:
+    """Geminiに渡す画像パート"""
+    data = video_info.get('thumbnail_bytes')
+    if not data:
+        return None
+    return {'mime_type': 'image/jpeg', 'data': data}
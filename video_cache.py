@@ -0,0 +1,138 @@
+"""動画メタデータの永続キャッシュ（SQLite）
+
+video_id をキーにタイトル・採用したサムネイルURL・サムネイル画像のバイト列を保存し、
+キャッシュヒット時はネットワークアクセスなしで get_video_info の結果を返せるようにする。
+ショート動画の音声文字起こし結果も video_id ごとに保存する。
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+CACHE_DIR = os.environ.get('TUBEHACKER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'tubehacker'))
+VIDEO_CACHE_TTL = int(os.environ.get('TUBEHACKER_VIDEO_CACHE_TTL', str(7 * 24 * 3600)))  # 秒
+VIDEO_CACHE_MAX_BYTES = int(os.environ.get('TUBEHACKER_VIDEO_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_metadata (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    thumbnail_url TEXT,
+    thumbnail BLOB,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_video_metadata_accessed ON video_metadata (accessed_at);
+CREATE TABLE IF NOT EXISTS audio_transcripts (
+    video_id TEXT PRIMARY KEY,
+    transcript TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class VideoMetadataCache:
+    """TTLと合計サイズ上限つきの動画メタデータキャッシュ"""
+
+    def __init__(self, path: str, ttl: float = VIDEO_CACHE_TTL, max_bytes: int = VIDEO_CACHE_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, video_id: str) -> Optional[dict]:
+        """キャッシュ済みなら {'title', 'thumbnail_url', 'thumbnail_bytes'} を返す"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT title, thumbnail_url, thumbnail, created_at FROM video_metadata WHERE video_id = ?',
+                (video_id,)
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                if row is not None:
+                    self._conn.execute('DELETE FROM video_metadata WHERE video_id = ?', (video_id,))
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE video_metadata SET accessed_at = ? WHERE video_id = ?', (now, video_id))
+            self.hits += 1
+        return {'title': row[0], 'thumbnail_url': row[1], 'thumbnail_bytes': row[2]}
+
+    def put(self, video_id: str, title: str, thumbnail_url: Optional[str], thumbnail_bytes: Optional[bytes]):
+        now = time.time()
+        size = len(title.encode('utf-8')) + len(thumbnail_bytes or b'')
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO video_metadata VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (video_id, title, thumbnail_url, thumbnail_bytes, size, now, now)
+            )
+            self._evict(now)
+
+    def get_transcript(self, video_id: str) -> Optional[str]:
+        """音声から文字起こし済みのテキスト"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT transcript FROM audio_transcripts WHERE video_id = ? AND created_at >= ?',
+                (video_id, time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put_transcript(self, video_id: str, transcript: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO audio_transcripts VALUES (?, ?, ?)', (video_id, transcript, now))
+            self._conn.execute('DELETE FROM audio_transcripts WHERE created_at < ?', (now - self.ttl,))
+
+    def _evict(self, now: float):
+        self._conn.execute('DELETE FROM video_metadata WHERE created_at < ?', (now - self.ttl,))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM video_metadata').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 最終アクセスが古いものから上限内に収まるまで削除
+        for video_id, size in self._conn.execute(
+            'SELECT video_id, size FROM video_metadata ORDER BY accessed_at'
+        ).fetchall():
+            self._conn.execute('DELETE FROM video_metadata WHERE video_id = ?', (video_id,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM video_metadata'
+            ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': total}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM video_metadata')
+            self._conn.execute('DELETE FROM audio_transcripts')
+            self.hits = 0
+            self.misses = 0
+
+
+_cache: Optional[VideoMetadataCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_video_cache() -> VideoMetadataCache:
+    """プロセス共有のキャッシュを取得（初回のみ作成）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VideoMetadataCache(os.path.join(CACHE_DIR, 'video_metadata.sqlite3'))
+    return _cache
@@ -0,0 +1,268 @@
+"""YouTubeページの解析ヘルパー"""
+import html
+import json
+import re
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+# 変数名の直後の代入部分（`window["ytInitialData"] = ` の `"]` や、= の前後の空白の有無・数を問わない）
+_ASSIGNMENT = re.compile(r'["\']?\]?\s*=\s*(?=\{)')
+_ASSIGNMENT_BYTES = re.compile(_ASSIGNMENT.pattern.encode('ascii'))
+
+_decoder = json.JSONDecoder()
+
+
+def _find_json_start(page, name) -> int:
+    """`name = {` の '{' の位置（見つからなければ-1）
+
+    変数名は文字列検索で探し、見つかった位置でだけ代入部分の正規表現を当てる。
+    """
+    assignment = _ASSIGNMENT if isinstance(page, str) else _ASSIGNMENT_BYTES
+    index = page.find(name)
+    while index >= 0:
+        match = assignment.match(page, index + len(name))
+        if match:
+            return match.end()
+        index = page.find(name, index + len(name))
+    return -1
+
+
+def extract_json_value(page: Union[str, bytes], name: str) -> Optional[dict]:
+    """page 内の `name = {...}` からJSON値を1つだけデコードする
+
+    bytes の場合は代入直後の `;</script>` までを切り出して json.loads し、
+    ページ全体の str へのデコードを避ける。失敗時のみ残り部分をデコードして raw_decode する。
+    """
+    if isinstance(page, (bytes, bytearray)):
+        start = _find_json_start(page, name.encode('ascii'))
+        if start < 0:
+            return None
+        end = page.find(b';</script>', start)
+        if end > 0:
+            try:
+                return json.loads(page[start:end])
+            except ValueError:
+                pass
+        page = page[start:].decode('utf-8', errors='replace')
+        start = 0
+    else:
+        start = _find_json_start(page, name)
+        if start < 0:
+            return None
+
+    try:
+        value, _ = _decoder.raw_decode(page, start)
+    except ValueError:
+        return None
+    return value
+
+
+def extract_yt_initial_data(page: Union[str, bytes]) -> Optional[dict]:
+    """ページ（str または bytes）から ytInitialData を取り出す"""
+    data = extract_json_value(page, 'ytInitialData')
+    return data if isinstance(data, dict) else None
+
+
+_OG_TITLE = re.compile(
+    rb'<meta\s[^>]*?property="og:title"[^>]*?\scontent="([^"]*)"'
+    rb'|<meta\s[^>]*?content="([^"]*)"[^>]*?\sproperty="og:title"'
+)
+_TITLE_TAG = re.compile(rb'<title[^>]*>([^<]*)</title>')
+_LD_JSON = re.compile(rb'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL)
+_JSON_TITLE = re.compile(rb'"title":"((?:[^"\\]|\\.)+)"')
+# タグが2つのチャンクにまたがっても見つけられるよう、前回の走査位置から少し戻って探す
+_TAG_OVERLAP = 2048
+
+
+def _clean_title(raw: bytes) -> str:
+    return html.unescape(raw.decode('utf-8', errors='replace')).replace(' - YouTube', '').strip()
+
+
+def _find_head_title(buf: bytearray, start: int) -> Optional[str]:
+    match = _OG_TITLE.search(buf, start)
+    if match:
+        title = _clean_title(match.group(1) or match.group(2))
+        if title:
+            return title
+    match = _TITLE_TAG.search(buf, start)
+    if match:
+        title = _clean_title(match.group(1))
+        if title and title != 'YouTube':
+            return title
+    return None
+
+
+def _find_body_title(buf: bytearray) -> Optional[str]:
+    # JSON-LD から
+    for match in _LD_JSON.finditer(buf):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        if isinstance(data, dict) and data.get('name'):
+            return data['name']
+
+    # ytInitialPlayerResponse から
+    player = extract_json_value(buf, 'ytInitialPlayerResponse')
+    if isinstance(player, dict):
+        title = player.get('videoDetails', {}).get('title')
+        if title:
+            return title
+
+    match = _JSON_TITLE.search(buf)
+    if match:
+        try:
+            return json.loads(b'"' + match.group(1) + b'"')
+        except ValueError:
+            pass
+    return None
+
+
+def extract_watch_title(chunks: Iterable[bytes]) -> Tuple[Optional[str], int]:
+    """視聴ページをチャンク単位で読み、タイトルと読み込んだバイト数を返す
+
+    og:title か <title> が見つかった時点で読み込みをやめる。<head> 内になければ
+    残りを読み、JSON-LD → ytInitialPlayerResponse の順で探す（全体のHTMLパースはしない）。
+    """
+    buf = bytearray()
+    scanned = 0
+    iterator = iter(chunks)
+    for chunk in iterator:
+        buf += chunk
+        start = max(0, scanned - _TAG_OVERLAP)
+        title = _find_head_title(buf, start)
+        if title:
+            return title, len(buf)
+        if buf.find(b'</head>', start) >= 0:
+            break
+        scanned = len(buf)
+
+    for chunk in iterator:
+        buf += chunk
+    return _find_body_title(buf), len(buf)
+
+
+_INNERTUBE_KEYS = {
+    'api_key': 'INNERTUBE_API_KEY',
+    'client_version': 'INNERTUBE_CLIENT_VERSION',
+}
+
+
+def extract_innertube_config(page: Union[str, bytes]) -> dict:
+    """ページ内の ytcfg から browse API 呼び出しに必要な値を取り出す"""
+    is_bytes = isinstance(page, (bytes, bytearray))
+    config = {}
+    for name, key in _INNERTUBE_KEYS.items():
+        pattern = rf'"{key}"\s*:\s*"([^"]+)"'
+        match = re.search(pattern.encode('ascii') if is_bytes else pattern, page)
+        if match:
+            value = match.group(1)
+            config[name] = value.decode('utf-8') if is_bytes else value
+    return config
+
+
+# 動画1件を表すレンダラー（richItemRenderer は content 内の videoRenderer として拾う）
+VIDEO_RENDERER_KEYS = ('videoRenderer', 'gridVideoRenderer', 'reelItemRenderer')
+
+# 動画レンダラーを含まないことが分かっているサブツリー（探索しない）
+_PRUNED_KEYS = frozenset({
+    'responseContext', 'frameworkUpdates', 'topbar', 'microformat', 'metadata',
+    'trackingParams', 'clickTrackingParams', 'loggingDirectives', 'accessibility',
+    'thumbnail', 'thumbnails', 'richThumbnail', 'thumbnailOverlays', 'channelThumbnailSupportedRenderers',
+    'navigationEndpoint', 'serviceEndpoint', 'inlinePlaybackEndpoint',
+    'menu', 'badges', 'ownerBadges', 'ownerText', 'shortBylineText', 'longBylineText',
+    'descriptionSnippet', 'detailedMetadataSnippets', 'title', 'headline',
+    'publishedTimeText', 'lengthText', 'viewCountText', 'shortViewCountText',
+})
+
+
+def runs_text(obj) -> str:
+    """{'runs': [...]} / {'simpleText': ...} / 文字列 からテキストを取り出す"""
+    if isinstance(obj, dict):
+        runs = obj.get('runs')
+        if runs:
+            return runs[0].get('text', '')
+        return obj.get('simpleText', '')
+    if isinstance(obj, str):
+        return obj
+    return ''
+
+
+def iter_videos(
+    data,
+    max_videos: Optional[int] = None,
+    renderer_keys: tuple = VIDEO_RENDERER_KEYS,
+    match_bare: bool = False,
+    seen: Optional[set] = None,
+) -> Iterator[dict]:
+    """ytInitialData を明示的なスタックで走査し、動画を出現順に重複なしで返す
+
+    match_bare=True の場合、レンダラーに包まれていない videoId + title の辞書も動画とみなす。
+    seen を渡すと複数ページにまたがって重複を除外できる。max_videos 件で走査を打ち切る。
+    """
+    if seen is None:
+        seen = set()
+    if max_videos is not None and max_videos <= 0:
+        return
+    count = 0
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(reversed(obj))
+            continue
+        if not isinstance(obj, dict):
+            continue
+
+        renderer = None
+        renderer_key = None
+        for key in renderer_keys:
+            value = obj.get(key)
+            if isinstance(value, dict):
+                renderer = value
+                renderer_key = key
+                break
+        if renderer is None and match_bare and len(obj.get('videoId') or '') == 11:
+            renderer = obj
+
+        if renderer is not None:
+            video_id = renderer.get('videoId', '')
+            title = runs_text(renderer.get('title') or renderer.get('headline'))
+            if video_id and title and video_id not in seen:
+                seen.add(video_id)
+                yield {'video_id': video_id, 'title': title, 'url': f'https://www.youtube.com/watch?v={video_id}'}
+                count += 1
+                if max_videos is not None and count >= max_videos:
+                    return
+
+        # 文書順に処理するため逆順で積む（見つけたレンダラーの中は探索しないが、兄弟のキーは探索する）
+        for key in reversed(list(obj)):
+            value = obj[key]
+            if key != renderer_key and key not in _PRUNED_KEYS and isinstance(value, (dict, list)):
+                stack.append(value)
+
+
+def find_continuation_token(data) -> Optional[str]:
+    """動画一覧の末尾にある continuationItemRenderer のトークン（最後のページならNone）
+
+    文書順に走査し、最後に見つかったものを返す。
+    """
+    token = None
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(reversed(obj))
+            continue
+        if not isinstance(obj, dict):
+            continue
+        renderer = obj.get('continuationItemRenderer')
+        if isinstance(renderer, dict):
+            command = renderer.get('continuationEndpoint', {}).get('continuationCommand', {})
+            if command.get('token'):
+                token = command['token']
+            continue
+        for key in reversed(list(obj)):
+            value = obj[key]
+            if key not in _PRUNED_KEYS and isinstance(value, (dict, list)):
+                stack.append(value)
+    return token